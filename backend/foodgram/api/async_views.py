@@ -0,0 +1,34 @@
+from functools import wraps
+from time import perf_counter
+
+from core.db import database_sync_to_async
+
+
+@database_sync_to_async
+def _call_view(view, request, *args, **kwargs):
+    response = view(request, *args, **kwargs)
+    if hasattr(response, 'render') and not response.is_rendered:
+        start = perf_counter()
+        response.render()
+        request._render_time = perf_counter() - start
+    if response.streaming:
+        # Django 3.2 перебирает потоковый ответ прямо в цикле событий,
+        # где запросы к БД запрещены, поэтому файл собирается здесь.
+        response.streaming_content = list(response.streaming_content)
+    return response
+
+
+def async_view(viewset, actions, **initkwargs):
+    """Возвращает асинхронное представление для действий вьюсета.
+
+    Аутентификация, запросы к БД и рендеринг ответа выполняются
+    в пуле потоков, а цикл событий обслуживает медленных клиентов,
+    не занимая воркер.
+    """
+    view = viewset.as_view(actions, **initkwargs)
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        return await _call_view(view, request, *args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,42 @@
+from hashlib import sha256
+from io import BytesIO
+
+from django.conf import settings
+from drf_extra_fields.fields import Base64ImageField
+from PIL import Image
+from rest_framework import serializers
+
+BASE64_HEADER_LENGTH = 64
+
+
+class RecipeImageField(Base64ImageField):
+    """Поле изображения рецепта.
+
+    Проверяет размер данных и изображения до полного декодирования
+    и называет файл по хэшу содержимого.
+    """
+
+    def to_internal_value(self, base64_data):
+        max_length = (
+            settings.RECIPE_IMAGE_MAX_SIZE * 4 // 3 + BASE64_HEADER_LENGTH
+        )
+        if isinstance(base64_data, str) and len(base64_data) > max_length:
+            raise serializers.ValidationError(
+                'Размер изображения превышает допустимый.'
+            )
+        return super().to_internal_value(base64_data)
+
+    def get_file_name(self, decoded_file):
+        return sha256(decoded_file).hexdigest()
+
+    def get_file_extension(self, filename, decoded_file):
+        try:
+            with Image.open(BytesIO(decoded_file)) as image:
+                width, height = image.size
+        except Exception:
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        if width * height > settings.RECIPE_IMAGE_MAX_PIXELS:
+            raise serializers.ValidationError(
+                'Разрешение изображения превышает допустимое.'
+            )
+        return super().get_file_extension(filename, decoded_file)
@@ -1,9 +1,12 @@
+from django.db.models import Count
 from django_filters.rest_framework import (BooleanFilter, CharFilter,
-                                           FilterSet,
+                                           ChoiceFilter, FilterSet,
                                            ModelMultipleChoiceFilter,
                                            NumberFilter)
 
-from content.models import Favourite, Ingredient, Recipe, ShoppingList, Tag
+from content.models import Ingredient, Recipe, RecipeIngredient, Tag
+from content.search import search_recipes
+from core.relations import get_relations
 
 
 class RecipeFilter(FilterSet):
@@ -16,32 +19,49 @@ class RecipeFilter(FilterSet):
         to_field_name='slug',
         queryset=Tag.objects.all()
     )
+    ingredients = ModelMultipleChoiceFilter(
+        queryset=Ingredient.objects.all(),
+        method='filter_ingredients'
+    )
+    search = CharFilter(method='filter_search')
+    ordering = ChoiceFilter(
+        choices=(('popular', 'Популярные'),),
+        method='filter_ordering'
+    )
 
     class Meta:
         model = Recipe
-        fields = ('is_favorited', 'is_in_shopping_cart', 'author', 'tags')
+        fields = (
+            'is_favorited', 'is_in_shopping_cart', 'author', 'tags',
+            'ingredients', 'search', 'ordering'
+        )
+
+    def filter_ingredients(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(id__in=RecipeIngredient.objects.filter(
+            ingredient__in=value
+        ).values('recipe').annotate(
+            matched=Count('ingredient', distinct=True)
+        ).filter(matched=len(value)).values('recipe'))
+
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
+    def filter_ordering(self, queryset, name, value):
+        return queryset.order_by('-favorites_count', 'id')
 
     def filter_is_favorited(self, queryset, name, value):
-        user = self.request.user
-        if user.is_authenticated:
-            recipe_ids = Favourite.objects.filter(user=user).values_list(
-                'recipe_id', flat=True
-            )
-            if value:
-                return queryset.filter(id__in=recipe_ids)
-            return queryset.exclude(id__in=recipe_ids)
-        return queryset.none() if value else queryset
+        recipe_ids = get_relations(self.request).favorites
+        if value:
+            return queryset.filter(id__in=recipe_ids)
+        return queryset.exclude(id__in=recipe_ids)
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
-        user = self.request.user
-        if user.is_authenticated:
-            recipe_ids = ShoppingList.objects.filter(user=user).values_list(
-                'recipe_id', flat=True
-            )
-            if value:
-                return queryset.filter(id__in=recipe_ids)
-            return queryset.exclude(id__in=recipe_ids)
-        return queryset.none() if value else queryset
+        recipe_ids = get_relations(self.request).shopping_cart
+        if value:
+            return queryset.filter(id__in=recipe_ids)
+        return queryset.exclude(id__in=recipe_ids)
 
 
 class IngredientFilter(FilterSet):
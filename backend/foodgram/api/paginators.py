@@ -1,6 +1,176 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
 from rest_framework import pagination
+from rest_framework.exceptions import NotFound, ParseError
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from content.feed import get_feed
+from content.models import Recipe
+
+
+class KeysetPagination(pagination.BasePagination):
+    """Пагинация по ключу (keyset) без OFFSET и подсчета COUNT(*).
+
+    Курсор содержит значения полей ordering последнего объекта
+    страницы, следующая страница выбирается условием «строго после».
+    """
+    ordering = ('id',)
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    page_size = 6
+    max_page_size = 50
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request)
+        cursor = self.decode_cursor(
+            request.query_params.get(self.cursor_query_param)
+        )
+        queryset = queryset.order_by(*self.ordering)
+        if cursor is not None:
+            queryset = queryset.filter(self.get_position_filter(
+                self.parse_cursor(cursor, queryset.model)
+            ))
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_ordering(self, request):
+        return self.ordering
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def parse_cursor(self, cursor, model):
+        """Приводит значения курсора к типам полей ordering модели."""
+        if len(cursor) != len(self.ordering) or None in cursor:
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            return [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, cursor)
+            ]
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_position_filter(self, cursor):
+        position = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, cursor):
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            name = field.lstrip('-')
+            position |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return position
+
+    def decode_cursor(self, encoded):
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode()))
+        except (BinasciiError, UnicodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(cursor, list):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def encode_cursor(self, obj):
+        # Страница может состоять из строк .values(), а не объектов.
+        cursor = [
+            obj[field.lstrip('-')] if isinstance(obj, dict)
+            else getattr(obj, field.lstrip('-'))
+            for field in self.ordering
+        ]
+        return urlsafe_b64encode(
+            json.dumps(cursor, default=str).encode()
+        ).decode()
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.page[-1])
+        )
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+
+class RecipeKeysetPagination(KeysetPagination):
+    """Курсор списка рецептов: по дате публикации или, при
+    ordering=popular, по числу добавлений в избранное.
+
+    Порядок по релевантности поиска не хранится в полях рецепта,
+    поэтому курсор с поиском не сочетается.
+    """
+    ordering = ('pub_date', 'id')
+    popular_ordering = ('-favorites_count', 'id')
+    search_cursor_message = (
+        'Курсор нельзя использовать вместе с поиском, используйте page.'
+    )
+
+    def get_ordering(self, request):
+        if request.query_params.get('search'):
+            raise ParseError({'errors': self.search_cursor_message})
+        if request.query_params.get('ordering') == 'popular':
+            return self.popular_ordering
+        return self.ordering
+
+
+class FeedPagination(KeysetPagination):
+    """Пагинация ленты подписок от новых рецептов к старым."""
+    ordering = ('-pub_date', '-id')
+
+    def paginate_feed(self, user, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(
+            request.query_params.get(self.cursor_query_param)
+        )
+        if cursor is not None:
+            cursor = self.parse_cursor(cursor, Recipe)
+        results = get_feed(user, self.page_size + 1, cursor)
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
 
 
 class LimitPagination(pagination.PageNumberPagination):
     page_size_query_param = 'limit'
     max_page_size = 50
+    keyset_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.keyset_class.cursor_query_param in request.query_params:
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class RecipePagination(LimitPagination):
+    keyset_class = RecipeKeysetPagination
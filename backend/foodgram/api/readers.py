@@ -0,0 +1,116 @@
+from collections import defaultdict
+
+from content.models import Recipe, RecipeIngredient
+from core.relations import get_relations
+from core.seralizers import get_image_urls
+
+USER_FIELDS = ('email', 'id', 'username', 'first_name', 'last_name')
+TAG_FIELDS = ('id', 'name', 'color', 'slug')
+INGREDIENT_FIELDS = ('id', 'name', 'measurement_unit')
+SHORT_RECIPE_FIELDS = (
+    'id', 'image', 'renditions_ready', 'name', 'cooking_time'
+)
+
+image_storage = Recipe._meta.get_field('image').storage
+
+
+def get_image_url(request, name):
+    """Возвращает абсолютный адрес изображения, как ImageField в DRF."""
+    if not name:
+        return None
+    return request.build_absolute_uri(image_storage.url(name))
+
+
+def short_recipe(request, row):
+    """Собирает рецепт по полям BasicRecipeSerializer."""
+    return {
+        'id': row['id'],
+        'image': get_image_url(request, row['image']),
+        'images': get_image_urls(
+            request, row['image'], row['renditions_ready']
+        ),
+        'name': row['name'],
+        'cooking_time': row['cooking_time'],
+    }
+
+
+def recipe_rows(queryset):
+    """Выбирает строки рецептов вместе с автором одним запросом.
+
+    pub_date и favorites_count нужны еще и для курсора пагинации.
+    """
+    return queryset.values(
+        *SHORT_RECIPE_FIELDS, 'text', 'pub_date', 'favorites_count',
+        *(f'author__{field}' for field in USER_FIELDS)
+    )
+
+
+def subscription_rows(queryset):
+    """Выбирает строки авторов для страницы подписок."""
+    return queryset.values(*USER_FIELDS, 'recipes_count')
+
+
+def read_recipes(request, rows):
+    """Собирает рецепты из строк recipe_rows по полям RecipeSerializer.
+
+    Экземпляры моделей и сериализаторов не создаются: теги
+    и ингредиенты всей страницы догружаются двумя запросами.
+    """
+    ids = [row['id'] for row in rows]
+    if not ids:
+        return []
+    relations = get_relations(request)
+    tags = defaultdict(list)
+    for recipe_id, *values in Recipe.tags.through.objects.filter(
+        recipe_id__in=ids
+    ).order_by('tag_id').values_list(
+        'recipe_id', *(f'tag__{field}' for field in TAG_FIELDS)
+    ):
+        tags[recipe_id].append(dict(zip(TAG_FIELDS, values)))
+    ingredients = defaultdict(list)
+    for recipe_id, amount, *values in RecipeIngredient.objects.filter(
+        recipe_id__in=ids
+    ).order_by('id').values_list(
+        'recipe_id', 'amount',
+        *(f'ingredient__{field}' for field in INGREDIENT_FIELDS)
+    ):
+        ingredients[recipe_id].append(
+            {'amount': amount, **dict(zip(INGREDIENT_FIELDS, values))}
+        )
+    recipes = []
+    for row in rows:
+        recipe = short_recipe(request, row)
+        author = {field: row[f'author__{field}'] for field in USER_FIELDS}
+        author['is_subscribed'] = author['id'] in relations.following
+        recipe.update({
+            'tags': tags[row['id']],
+            'text': row['text'],
+            'author': author,
+            'ingredients': ingredients[row['id']],
+            'is_favorited': row['id'] in relations.favorites,
+            'is_in_shopping_cart': row['id'] in relations.shopping_cart,
+        })
+        recipes.append(recipe)
+    return recipes
+
+
+def read_subscriptions(request, rows, recipes):
+    """Собирает авторов из строк subscription_rows
+    по полям SubscribeUserSerializer.
+
+    recipes — queryset рецептов подписок с учетом recipes_limit.
+    """
+    author_recipes = defaultdict(list)
+    for row in recipes.filter(
+        author_id__in=[row['id'] for row in rows]
+    ).values(*SHORT_RECIPE_FIELDS, 'author_id'):
+        author_recipes[row['author_id']].append(short_recipe(request, row))
+    return [
+        {
+            **{field: row[field] for field in USER_FIELDS},
+            'is_subscribed': True,
+            'recipes': author_recipes[row['id']],
+            'recipes_count': row['recipes_count'],
+        }
+        for row in rows
+    ]
@@ -1,8 +1,15 @@
-from drf_extra_fields.fields import Base64ImageField
+from django.conf import settings
+from django.db import connection, transaction
 from rest_framework import serializers
 
-from content.models import (Favourite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingList, Tag)
+from .fields import RecipeImageField
+from content.feed import fan_out
+from content.images import check_renditions, schedule_renditions
+from content.matching import recipe_match_index
+from content.models import Ingredient, Recipe, RecipeIngredient, Tag
+from content.search import update_search_index
+from core.counters import update_counter
+from core.relations import get_relations
 from core.seralizers import BasicRecipeSerializer, BasicUserSerializer
 from users.models import User
 
@@ -29,14 +36,29 @@ class UserSerializer(BasicUserSerializer):
 class SubscribeUserSerializer(BasicUserSerializer):
     """Сериалайзер для работы с пользователями при обработке подписок."""
     recipes = BasicRecipeSerializer(many=True)
-    recipes_count = serializers.SerializerMethodField()
 
     class Meta:
         model = User
         fields = BasicUserSerializer.Meta.fields + ('recipes', 'recipes_count')
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
+
+class BatchSerializer(serializers.Serializer):
+    """Сериалайзер списка id для пакетных действий."""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.RELATION_BATCH_LIMIT
+    )
+
+    def validate_ids(self, value):
+        return list(dict.fromkeys(value))
+
+
+class ServingsSerializer(serializers.Serializer):
+    """Сериалайзер множителя порций рецепта в списке покупок."""
+    servings = serializers.IntegerField(
+        min_value=1, max_value=settings.MAX_SERVINGS, default=1
+    )
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -87,16 +109,20 @@ class RecipeSerializer(BasicRecipeSerializer):
         )
 
     def get_is_favorited(self, obj):
-        user = self.context['request'].user
-        if user.is_authenticated:
-            return Favourite.objects.filter(recipe=obj, user=user).exists()
-        return False
+        return obj.id in get_relations(self.context['request']).favorites
 
     def get_is_in_shopping_cart(self, obj):
-        user = self.context['request'].user
-        if user.is_authenticated:
-            return ShoppingList.objects.filter(recipe=obj, user=user).exists()
-        return False
+        return obj.id in get_relations(
+            self.context['request']
+        ).shopping_cart
+
+
+class RecipeMatchSerializer(RecipeSerializer):
+    """Сериалайзер рецепта с долей найденных ингредиентов."""
+    coverage = serializers.FloatField(read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ('coverage',)
 
 
 class CreateRecipeIngredientSerializer(serializers.ModelSerializer):
@@ -104,50 +130,179 @@ class CreateRecipeIngredientSerializer(serializers.ModelSerializer):
     в рецептах при добавлении нового.
     """
     id = serializers.IntegerField()
-    amount = serializers.IntegerField()
+    amount = serializers.IntegerField(min_value=1)
 
     class Meta:
         model = RecipeIngredient
         fields = ('id', 'amount')
 
 
+class TagField(serializers.PrimaryKeyRelatedField):
+    """Поле тега, использующее загруженные заранее теги из контекста."""
+
+    def to_internal_value(self, data):
+        tags = self.context.get('tags_map')
+        if tags is not None and isinstance(data, int) and data in tags:
+            return tags[data]
+        return super().to_internal_value(data)
+
+
+class BulkCreateRecipeSerializer(serializers.ListSerializer):
+    """Сериалайзер для пакетного импорта рецептов."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            items = [item for item in data if isinstance(item, dict)]
+            self._context['ingredients_map'] = Ingredient.objects.in_bulk([
+                ingredient.get('id') for item in items
+                for ingredient in item.get('ingredients', ())
+                if isinstance(ingredient, dict)
+                and isinstance(ingredient.get('id'), int)
+            ])
+            self._context['tags_map'] = Tag.objects.in_bulk([
+                tag for item in items for tag in item.get('tags', ())
+                if isinstance(tag, int)
+            ])
+        return super().to_internal_value(data)
+
+    @transaction.atomic
+    def create(self, validated_data):
+        author = self.context['request'].user
+        recipes = [
+            Recipe(author=author, **{
+                key: value for key, value in item.items()
+                if key not in ('recipe_ingredients', 'tags')
+            })
+            for item in validated_data
+        ]
+        if connection.features.can_return_rows_from_bulk_insert:
+            # bulk_create не отправляет сигналы с обработкой изображений.
+            check_renditions(recipes)
+            Recipe.objects.bulk_create(recipes)
+            schedule_renditions(recipes)
+            update_counter(
+                User.objects.filter(id=author.id), 'recipes_count',
+                len(recipes)
+            )
+        else:
+            for recipe in recipes:
+                recipe.save()
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tag)
+            for recipe, item in zip(recipes, validated_data)
+            for tag in item['tags']
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, **ingredient_data)
+            for recipe, item in zip(recipes, validated_data)
+            for ingredient_data in item['recipe_ingredients']
+        )
+        fan_out(recipes)
+        transaction.on_commit(
+            lambda: update_search_index(recipe.id for recipe in recipes)
+        )
+        transaction.on_commit(lambda: recipe_match_index.update_recipes(
+            recipe.id for recipe in recipes
+        ))
+        return recipes
+
+
 class CreateRecipeSerializer(serializers.ModelSerializer):
     """Сериалайзер для работы с рецептами при добавлении нового."""
     ingredients = CreateRecipeIngredientSerializer(
         many=True, source='recipe_ingredients'
     )
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = TagField(
         queryset=Tag.objects.all(), many=True
     )
-    image = Base64ImageField()
+    image = RecipeImageField()
 
     class Meta:
         model = Recipe
         fields = (
             'ingredients', 'tags', 'image', 'name', 'text', 'cooking_time'
         )
+        list_serializer_class = BulkCreateRecipeSerializer
 
     def validate(self, data):
+        if self.partial and 'recipe_ingredients' not in data:
+            return data
         ingredients = data.get('recipe_ingredients')
         if not ingredients:
             raise serializers.ValidationError(
                 'Рецепт должен содержать хотя бы один ингредиент.'
             )
+        ids = [ingredient_data['id'] for ingredient_data in ingredients]
+        if len(set(ids)) != len(ids):
+            raise serializers.ValidationError(
+                'Ингредиенты в рецепте не должны повторяться.'
+            )
+        known = self.context.get('ingredients_map')
+        if known is None:
+            known = Ingredient.objects.in_bulk(ids)
+        missing = [pk for pk in ids if pk not in known]
+        if missing:
+            raise serializers.ValidationError(
+                {'ingredients': f'Ингредиенты не найдены: {missing}.'}
+            )
+        data['recipe_ingredients'] = [
+            {
+                'ingredient': known[ingredient_data['id']],
+                'amount': ingredient_data['amount']
+            }
+            for ingredient_data in ingredients
+        ]
         return data
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop('recipe_ingredients')
         tags = validated_data.pop('tags')
         author = self.context['request'].user
         recipe = Recipe.objects.create(author=author, **validated_data)
         recipe.tags.set(tags)
-        recipe_ingredients = [
-            RecipeIngredient(
-                recipe=recipe,
-                ingredient=Ingredient.objects.get(id=ingredient_data['id']),
-                amount=ingredient_data['amount']
-            )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, **ingredient_data)
             for ingredient_data in ingredients_data
-        ]
-        RecipeIngredient.objects.bulk_create(recipe_ingredients)
+        )
+        fan_out((recipe,))
         return recipe
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        ingredients_data = validated_data.pop('recipe_ingredients', None)
+        tags = validated_data.pop('tags', None)
+        instance = super().update(instance, validated_data)
+        if tags is not None:
+            instance.tags.set(tags)
+        if ingredients_data is not None:
+            self.update_ingredients(instance, ingredients_data)
+        return instance
+
+    def update_ingredients(self, recipe, ingredients_data):
+        """Применяет к рецепту только изменившиеся ингредиенты."""
+        existing = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in recipe.recipe_ingredients.all()
+        }
+        to_create, to_update = [], []
+        for ingredient_data in ingredients_data:
+            recipe_ingredient = existing.pop(
+                ingredient_data['ingredient'].id, None
+            )
+            if recipe_ingredient is None:
+                to_create.append(
+                    RecipeIngredient(recipe=recipe, **ingredient_data)
+                )
+            elif recipe_ingredient.amount != ingredient_data['amount']:
+                recipe_ingredient.amount = ingredient_data['amount']
+                to_update.append(recipe_ingredient)
+        if existing:
+            RecipeIngredient.objects.filter(
+                id__in=[item.id for item in existing.values()]
+            ).delete()
+        RecipeIngredient.objects.bulk_update(to_update, ('amount',))
+        RecipeIngredient.objects.bulk_create(to_create)
+
+    def to_representation(self, instance):
+        return RecipeSerializer(instance, context=self.context).data
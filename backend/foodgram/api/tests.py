@@ -0,0 +1,203 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from .readers import (read_recipes, read_subscriptions, recipe_rows,
+                      subscription_rows)
+from .serializers import RecipeSerializer, SubscribeUserSerializer
+from .utils import get_subscription_recipes, with_subscription_data
+from content.models import (Favourite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingList, Tag)
+from users.models import Follow, User
+
+
+class RecipeDataMixin:
+    """Авторы с рецептами, тегами и ингредиентами и читатель,
+    который подписан на авторов и отметил часть рецептов.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Читатель', last_name='Тестов', password='pass'
+        )
+        cls.authors = [
+            User.objects.create_user(
+                username=f'author{i}', email=f'author{i}@example.com',
+                first_name='Автор', last_name=f'№{i}', password='pass'
+            )
+            for i in range(2)
+        ]
+        tags = [
+            Tag.objects.create(name=f'Тег {i}', color=f'#00000{i}',
+                               slug=f'tag{i}')
+            for i in range(2)
+        ]
+        ingredients = [
+            Ingredient.objects.create(name=f'Ингредиент {i}',
+                                      measurement_unit='г')
+            for i in range(3)
+        ]
+        for number in range(8):
+            author = cls.authors[number % 2]
+            recipe = Recipe.objects.create(
+                author=author, name=f'Рецепт {number}', text='Описание',
+                image='images/recipe.jpg', cooking_time=number + 1
+            )
+            recipe.tags.set(tags[:number % 2 + 1])
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient, amount=number + 10
+                )
+                for ingredient in ingredients[:number % 3 + 1]
+            )
+            if number % 3 == 0:
+                Favourite.objects.create(user=cls.reader, recipe=recipe)
+            if number % 4 == 0:
+                ShoppingList.objects.create(user=cls.reader, recipe=recipe)
+        Follow.objects.create(user=cls.reader, following=cls.authors[0])
+        Follow.objects.create(user=cls.reader, following=cls.authors[1])
+
+    def setUp(self):
+        cache.clear()
+
+    def make_request(self, path):
+        request = Request(APIRequestFactory().get(path))
+        request.user = self.reader
+        return request
+
+
+class ReadersTest(RecipeDataMixin, TestCase):
+    """Ответы, собранные из строк БД, совпадают с ответами
+    сериализаторов байт в байт.
+    """
+
+    def render(self, data):
+        return JSONRenderer().render(data)
+
+    def test_recipes(self):
+        request = self.make_request('/api/recipes/')
+        queryset = Recipe.objects.order_by('id')
+        expected = RecipeSerializer(
+            queryset.for_feed(), many=True, context={'request': request}
+        ).data
+        rows = list(recipe_rows(queryset))
+        self.assertEqual(
+            self.render(read_recipes(request, rows)), self.render(expected)
+        )
+
+    def test_subscriptions(self):
+        for path in ('/api/users/subscriptions/',
+                     '/api/users/subscriptions/?recipes_limit=2'):
+            with self.subTest(path=path):
+                request = self.make_request(path)
+                queryset = User.objects.filter(
+                    id__in=[author.id for author in self.authors]
+                ).order_by('id')
+                expected = SubscribeUserSerializer(
+                    with_subscription_data(queryset, request), many=True,
+                    context={'request': request}
+                ).data
+                rows = list(subscription_rows(queryset))
+                self.assertEqual(
+                    self.render(read_subscriptions(
+                        request, rows, get_subscription_recipes(request)
+                    )),
+                    self.render(expected)
+                )
+
+
+class RecipeCursorTest(RecipeDataMixin, TestCase):
+    """Курсор списка рецептов учитывает выбранный порядок."""
+
+    def walk(self, path):
+        ids = []
+        while path:
+            response = self.client.get(path)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(recipe['id'] for recipe in response.data['results'])
+            path = response.data['next']
+        return ids
+
+    def test_popular(self):
+        Recipe.objects.filter(id__in=Recipe.objects.order_by('id').values(
+            'id'
+        )[:3]).update(favorites_count=5)
+        self.assertEqual(
+            self.walk('/api/recipes/?ordering=popular&limit=3&cursor='),
+            list(Recipe.objects.order_by(
+                '-favorites_count', 'id'
+            ).values_list('id', flat=True))
+        )
+
+    def test_search(self):
+        response = self.client.get('/api/recipes/?search=Рецепт&cursor=')
+        self.assertEqual(response.status_code, 400)
+
+
+class RecipeEtagTest(RecipeDataMixin, TestCase):
+    """ETag рецептов меняется вместе с данными, которые не хранятся
+    в строке рецепта.
+    """
+
+    def get_etag(self, path):
+        # bump_version срабатывает после коммита.
+        with self.captureOnCommitCallbacks(execute=True):
+            pass
+        return self.client.get(path)['ETag']
+
+    def test_author_change(self):
+        recipe = Recipe.objects.filter(author=self.authors[0]).first()
+        paths = ('/api/recipes/', f'/api/recipes/{recipe.id}/')
+        before = [self.get_etag(path) for path in paths]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.authors[0].first_name = 'Переименован'
+            self.authors[0].save()
+        self.assertEqual(
+            [before != self.get_etag(path) for path in paths], [True, True]
+        )
+
+    def test_popular_counter(self):
+        path = '/api/recipes/?ordering=popular'
+        before = self.get_etag(path)
+        client = APIClient()
+        client.force_authenticate(self.authors[1])
+        recipe = Recipe.objects.filter(author=self.authors[0]).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(f'/api/recipes/{recipe.id}/favorite/')
+        self.assertEqual(response.status_code, 201)
+        self.assertNotEqual(self.get_etag(path), before)
+
+    def test_not_modified_vary(self):
+        recipe = Recipe.objects.first()
+        for path in ('/api/recipes/', f'/api/recipes/{recipe.id}/',
+                     '/api/tags/'):
+            with self.subTest(path=path):
+                etag = self.get_etag(path)
+                response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertIn('Accept-Encoding', response['Vary'])
+
+
+class RecipeListQueriesTest(RecipeDataMixin, TestCase):
+    """Число запросов списка рецептов не зависит от размера страницы."""
+
+    def count_queries(self, path):
+        cache.clear()
+        client = APIClient()
+        client.force_authenticate(self.reader)
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_page_size(self):
+        small = self.count_queries('/api/recipes/?limit=2')
+        large = self.count_queries('/api/recipes/?limit=6')
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, 6)
@@ -1,9 +1,12 @@
+from django.conf import settings
 from django.urls import include, path
 from djoser.views import UserViewSet
 from rest_framework.routers import SimpleRouter
 
-from .views import (IngredientViewSet, RecipeViewSet, SubscribeView,
-                    SubscribitionsView, TagViewSet)
+from .async_views import async_view
+from .views import (IngredientViewSet, MetricsView, RecipeViewSet,
+                    SubscribeBatchView, SubscribeView, SubscribitionsView,
+                    TagViewSet)
 
 router = SimpleRouter()
 
@@ -11,7 +14,69 @@ router.register('recipes', RecipeViewSet, basename='recipes')
 router.register('tags', TagViewSet, basename='tags')
 router.register('ingredients', IngredientViewSet, basename='ingredients')
 
+# В режиме ASGI горячие эндпоинты чтения обслуживаются асинхронными
+# представлениями, остальные маршруты остаются синхронными.
+async_urlpatterns = [
+    path(
+        'recipes/',
+        async_view(
+            RecipeViewSet, {'get': 'list', 'post': 'create'},
+            basename='recipes', detail=False
+        ),
+        name='recipes-list'
+    ),
+    path(
+        'recipes/download_shopping_cart/',
+        async_view(
+            RecipeViewSet, {'get': 'download_shopping_cart'},
+            basename='recipes', detail=False
+        ),
+        name='recipes-download-shopping-cart'
+    ),
+    path(
+        'recipes/<int:pk>/',
+        async_view(
+            RecipeViewSet,
+            {'get': 'retrieve', 'patch': 'partial_update',
+             'delete': 'destroy'},
+            basename='recipes', detail=True
+        ),
+        name='recipes-detail'
+    ),
+    path(
+        'tags/',
+        async_view(
+            TagViewSet, {'get': 'list'}, basename='tags', detail=False
+        ),
+        name='tags-list'
+    ),
+    path(
+        'tags/<int:pk>/',
+        async_view(
+            TagViewSet, {'get': 'retrieve'}, basename='tags', detail=True
+        ),
+        name='tags-detail'
+    ),
+    path(
+        'ingredients/',
+        async_view(
+            IngredientViewSet, {'get': 'list'},
+            basename='ingredients', detail=False
+        ),
+        name='ingredients-list'
+    ),
+    path(
+        'ingredients/<int:pk>/',
+        async_view(
+            IngredientViewSet, {'get': 'retrieve'},
+            basename='ingredients', detail=True
+        ),
+        name='ingredients-detail'
+    ),
+]
+
 urlpatterns = [
+    *(async_urlpatterns if settings.ASYNC_VIEWS else ()),
     path('', include(router.urls)),
     path(
         'users/',
@@ -33,6 +98,11 @@ urlpatterns = [
         SubscribitionsView.as_view(),
         name='subscriptions'
     ),
+    path(
+        'users/subscribe/',
+        SubscribeBatchView.as_view(),
+        name='subscribe_batch'
+    ),
     path(
         'users/<int:id>/subscribe/',
         SubscribeView.as_view(),
@@ -44,4 +114,5 @@ urlpatterns = [
         name='user_set_password'
     ),
     path('auth/', include('djoser.urls.authtoken')),
+    path('_metrics/', MetricsView.as_view(), name='metrics'),
 ]
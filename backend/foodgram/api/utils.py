@@ -1,47 +1,234 @@
+import csv
 from io import BytesIO
 
-from django.http import FileResponse
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (BigIntegerField, ExpressionWrapper, F, Max,
+                              Prefetch, Sum, Value, Window)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast, RowNumber
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_vary_headers
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
 from rest_framework import status
 from rest_framework.response import Response
 
-from content.models import Recipe
+from content.models import Ingredient, Recipe, ShoppingList, Tag
+from content.units import humanize, unit_table
+from core.cache import get_version, make_etag
+from core.counters import update_counter
+from core.relations import get_relations, invalidate_relations
+from users.models import Follow, User
 
+SHOPPING_LIST_HEADER = ('Ингредиент', 'Количество', 'Единица измерения')
+PDF_FONT_NAME = 'ShoppingListFont'
+PDF_FONT_SIZE = 12
+PDF_MARGIN = 50
+PDF_CHUNK_SIZE = 64 * 1024
 
-def file_create(recipes):
-    """Функция для создания файла со всеми ингредиентами."""
-    aggregated_ingredients = {}
-    for recipe in recipes:
-        for recipe_ingredient in recipe.recipe_ingredients.all():
-            key = (
-                recipe_ingredient.ingredient.name,
-                recipe_ingredient.ingredient.measurement_unit
-            )
-            if key in aggregated_ingredients:
-                aggregated_ingredients[key] += recipe_ingredient.amount
-            else:
-                aggregated_ingredients[key] = recipe_ingredient.amount
-
-    content = "\n".join(
-        [f"{ingredient[0]} {amount} {ingredient[1]}"
-         for ingredient, amount in aggregated_ingredients.items()]
+
+class Echo:
+    """Псевдобуфер, возвращающий записанную строку без хранения."""
+
+    def write(self, value):
+        return value
+
+
+def get_shopping_list(user):
+    """Функция для суммирования ингредиентов из списка покупок в БД.
+
+    Количества переводятся в базовые единицы (г, мл, шт.) и умножаются
+    на число порций рецепта, поэтому «200 г» и «1 кг» муки
+    складываются в одну строку.
+    """
+    field = 'recipe__recipe_ingredients__'
+    unit, factor = unit_table.expressions(
+        f'{field}ingredient__measurement_unit'
     )
-    byte_content = content.encode('utf-8')
-    response = FileResponse(
-        BytesIO(byte_content),
-        as_attachment=True,
-        filename='shopping_list.txt'
+    # smallint * int * smallint в PostgreSQL считается в 32 битах
+    # и переполняется на больших количествах.
+    total = ExpressionWrapper(
+        Cast(f'{field}amount', BigIntegerField()) * factor * F('servings'),
+        output_field=BigIntegerField()
+    )
+    return ShoppingList.objects.filter(user=user).values(
+        name=F(f'{field}ingredient__name'), unit=unit
+    ).annotate(total=Sum(total)).order_by('name', 'unit')
+
+
+def _iter_rows(ingredients):
+    for item in ingredients.iterator():
+        yield (item['name'], *humanize(item['total'], item['unit']))
+
+
+def _stream_txt(ingredients):
+    for name, amount, unit in _iter_rows(ingredients):
+        yield f'{name} {amount} {unit}\n'
+
+
+def _stream_csv(ingredients):
+    writer = csv.writer(Echo())
+    yield writer.writerow(SHOPPING_LIST_HEADER)
+    for row in _iter_rows(ingredients):
+        yield writer.writerow(row)
+
+
+def _stream_pdf(ingredients):
+    if PDF_FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont(PDF_FONT_NAME, settings.PDF_FONT_PATH))
+    buffer = BytesIO()
+    page = canvas.Canvas(buffer, pagesize=A4)
+    _, height = A4
+    y = height - PDF_MARGIN
+    page.setFont(PDF_FONT_NAME, PDF_FONT_SIZE)
+    for name, amount, unit in _iter_rows(ingredients):
+        if y < PDF_MARGIN:
+            page.showPage()
+            page.setFont(PDF_FONT_NAME, PDF_FONT_SIZE)
+            y = height - PDF_MARGIN
+        page.drawString(PDF_MARGIN, y, f'{name} {amount} {unit}')
+        y -= PDF_FONT_SIZE * 1.5
+    page.save()
+    buffer.seek(0)
+    yield from iter(lambda: buffer.read(PDF_CHUNK_SIZE), b'')
+
+
+SHOPPING_LIST_FORMATS = {
+    'txt': (_stream_txt, 'text/plain; charset=utf-8'),
+    'csv': (_stream_csv, 'text/csv; charset=utf-8'),
+    'pdf': (_stream_pdf, 'application/pdf'),
+}
+
+
+def file_create(ingredients, file_format='txt'):
+    """Функция для потоковой выгрузки файла со всеми ингредиентами."""
+    stream, content_type = SHOPPING_LIST_FORMATS[file_format]
+    response = StreamingHttpResponse(
+        stream(ingredients), content_type=content_type
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="shopping_list.{file_format}"'
     )
-    response['Content-Type'] = 'text/plain'
     return response
 
 
-def create_obj(request, pk, model, serializer):
-    """Функция для создания объекта, связанного с рецептами"""
-    recipe = get_object_or_404(Recipe, id=pk)
-    _, created = model.objects.get_or_create(
-        user=request.user, recipe=recipe
+def get_recipe_etag(request, pk):
+    """Функция для вычисления ETag рецепта без его сериализации.
+
+    Учитывает версию рецепта, данных авторов, справочников тегов
+    и ингредиентов и связи пользователя с рецептом и автором.
+    Возвращает None, если рецепта нет.
+    """
+    row = Recipe.objects.filter(pk=pk).values_list(
+        'updated_at', 'author_id'
+    ).first()
+    if row is None:
+        return None
+    updated_at, author_id = row
+    relations = get_relations(request)
+    return make_etag(
+        request, 'recipe', pk, updated_at.isoformat(), get_version(User)[0],
+        get_version(Tag)[0], get_version(Ingredient)[0],
+        pk in relations.favorites, pk in relations.shopping_cart,
+        author_id in relations.following
     )
+
+
+def get_recipes_etag(request, queryset):
+    """Функция для вычисления ETag страницы рецептов без выборки самих
+    рецептов.
+
+    Последнее изменение берется по всем рецептам (одно чтение индекса),
+    поэтому учитывает и рецепты, покинувшие выборку, удаления учитывает
+    версия модели, изменения авторов — версия пользователей. Для
+    сортировки по популярности добавляется версия счетчика избранного.
+    """
+    relations = get_relations(request)
+    parts = [
+        Recipe.objects.aggregate(updated_at=Max('updated_at'))['updated_at'],
+        get_version(Recipe)[0],
+        get_version(User)[0],
+        get_version(Tag)[0],
+        get_version(Ingredient)[0],
+        hash((
+            relations.favorites, relations.shopping_cart, relations.following
+        )),
+    ]
+    if request.query_params.get('ordering') == 'popular':
+        parts.append(get_version(Recipe, 'favorites_count')[0])
+    return make_etag(request, 'recipes', request.get_full_path(), *parts)
+
+
+def with_etag(response, etag):
+    """Функция добавляет к ответу ETag и Vary по заголовку авторизации:
+    флаги избранного и подписок зависят от пользователя, — и по сжатию,
+    которое учитывает ETag. CompressionMiddleware добавляет Vary только
+    к сжимаемому телу, а у ответа 304 тела нет.
+    """
+    response['ETag'] = etag
+    patch_vary_headers(response, ('Authorization', 'Accept-Encoding'))
+    return response
+
+
+def get_recipes_limit(request):
+    """Функция для получения лимита рецептов в подписках из запроса."""
+    limit = request.query_params.get('recipes_limit', '')
+    return int(limit) if limit.isdigit() else None
+
+
+def get_subscription_recipes(request):
+    """Функция для получения рецептов авторов из подписок.
+
+    Рецепты каждого автора ограничиваются параметром recipes_limit
+    через ROW_NUMBER() OVER (PARTITION BY author), поэтому страница
+    подписок загружается фиксированным числом запросов.
+    """
+    limit = get_recipes_limit(request)
+    if limit is None:
+        return Recipe.objects.all()
+    ranked = Recipe.objects.filter(
+        author__in=Follow.objects.filter(
+            user=request.user
+        ).values('following')
+    ).annotate(
+        recipe_rank=Window(
+            RowNumber(),
+            partition_by=F('author_id'),
+            order_by=(F('pub_date').asc(), F('id').asc())
+        )
+    ).values('id', 'recipe_rank').order_by()
+    sql, params = ranked.query.sql_with_params()
+    return Recipe.objects.filter(id__in=RawSQL(
+        f'SELECT id FROM ({sql}) AS ranked WHERE recipe_rank <= %s',
+        (*params, limit)
+    ))
+
+
+def with_subscription_data(queryset, request):
+    """Функция для подгрузки рецептов и счетчиков авторов в подписках."""
+    return queryset.annotate(
+        is_subscribed=Value(True)
+    ).prefetch_related(
+        Prefetch('recipes', queryset=get_subscription_recipes(request))
+    )
+
+
+def create_obj(request, pk, model, serializer, **defaults):
+    """Функция для создания объекта, связанного с рецептами"""
+    with transaction.atomic():
+        # Строка рецепта блокируется в том же порядке, что в create_objs.
+        recipe = get_object_or_404(Recipe.objects.select_for_update(), id=pk)
+        _, created = model.objects.get_or_create(
+            user=request.user, recipe=recipe, defaults=defaults
+        )
+        if created:
+            update_counter(
+                Recipe.objects.filter(id=recipe.id), model.counter_field, 1
+            )
     if not created:
         return Response(
             {'errors': 'Вы уже выполнили это действие.'},
@@ -55,13 +242,85 @@ def create_obj(request, pk, model, serializer):
 
 def delete_obj(request, pk, model):
     """Функция для удаления объекта, связанного с рецептами"""
-    recipe = get_object_or_404(Recipe, id=pk)
-    obj = model.objects.filter(
-        user=request.user, recipe=recipe).first()
-    if not obj:
+    with transaction.atomic():
+        recipe = get_object_or_404(Recipe.objects.select_for_update(), id=pk)
+        # Счетчик уменьшается, только если строку удалил этот запрос.
+        deleted, _ = model.objects.filter(
+            user=request.user, recipe=recipe
+        ).delete()
+        if deleted:
+            update_counter(
+                Recipe.objects.filter(id=recipe.id), model.counter_field, -1
+            )
+    if not deleted:
         return Response(
             {'errors': 'Невозможно выполнить это действие.'},
             status=status.HTTP_400_BAD_REQUEST
         )
-    obj.delete()
     return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+def lock_counters(queryset, ids):
+    """Блокирует строки со счетчиками до конца транзакции и возвращает
+    найденные id.
+
+    Параллельные запросы (одиночные и пакетные) к тем же объектам
+    выполняются по очереди, поэтому набор существующих связей,
+    прочитанный после блокировки, совпадает с тем, что изменит INSERT
+    или DELETE, и счетчик не меняется дважды. Строки блокируются
+    по возрастанию id, чтобы запросы не ждали друг друга по кругу.
+    """
+    return set(queryset.select_for_update().filter(
+        id__in=ids
+    ).order_by('id').values_list('id', flat=True))
+
+
+def create_objs(user, model, field, ids, queryset, counter_field):
+    """Функция для создания связей пользователя с объектами ids
+    одним INSERT.
+
+    bulk_create не отправляет сигналы, поэтому счетчики и кэш связей
+    пользователя обновляются здесь же. Возвращает статус по каждому id.
+    """
+    with transaction.atomic():
+        found = lock_counters(queryset, ids)
+        existing = set(model.objects.filter(
+            user=user, **{f'{field}_id__in': found}
+        ).values_list(f'{field}_id', flat=True))
+        created = found - existing
+        model.objects.bulk_create(
+            [model(user=user, **{f'{field}_id': pk}) for pk in created],
+            ignore_conflicts=True
+        )
+        update_counter(queryset.filter(id__in=created), counter_field, 1)
+        transaction.on_commit(lambda: invalidate_relations(user.id))
+    return [
+        {
+            'id': pk,
+            'status': (
+                'created' if pk in created
+                else 'exists' if pk in existing
+                else 'not_found'
+            ),
+        }
+        for pk in ids
+    ]
+
+
+def delete_objs(user, model, field, ids, queryset, counter_field):
+    """Функция для удаления связей пользователя с объектами ids
+    одним DELETE. Возвращает статус по каждому id.
+
+    counter_field не передается, если счетчик уменьшает post_delete.
+    """
+    with transaction.atomic():
+        lock_counters(queryset, ids)
+        links = model.objects.filter(user=user, **{f'{field}_id__in': ids})
+        deleted = set(links.values_list(f'{field}_id', flat=True))
+        links.delete()
+        if counter_field:
+            update_counter(queryset.filter(id__in=deleted), counter_field, -1)
+    return [
+        {'id': pk, 'status': 'deleted' if pk in deleted else 'missing'}
+        for pk in ids
+    ]
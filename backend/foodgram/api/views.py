@@ -1,21 +1,40 @@
+from django.conf import settings
+from django.db import transaction
+from django.http import Http404, HttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.decorators import method_decorator
 from rest_framework import (generics, mixins, permissions, status, views,
                             viewsets)
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
 from .filters import IngredientFilter, RecipeFilter
-from .paginators import LimitPagination
+from .paginators import FeedPagination, LimitPagination, RecipePagination
 from .permissions import IsAuthorOrReadOnly
-from .serializers import (CreateRecipeSerializer, IngredientSerializer,
-                          RecipeSerializer, SubscribeUserSerializer,
-                          TagSerializer)
-from .utils import create_obj, delete_obj, file_create
+from .readers import (INGREDIENT_FIELDS, TAG_FIELDS, read_recipes,
+                      read_subscriptions, recipe_rows, subscription_rows)
+from .serializers import (BatchSerializer, CreateRecipeSerializer,
+                          IngredientSerializer, RecipeMatchSerializer,
+                          RecipeSerializer, ServingsSerializer,
+                          SubscribeUserSerializer, TagSerializer)
+from .utils import (SHOPPING_LIST_FORMATS, create_obj, create_objs, delete_obj,
+                    delete_objs, file_create, get_recipe_etag,
+                    get_recipes_etag, get_shopping_list,
+                    get_subscription_recipes, with_etag,
+                    with_subscription_data)
+from content.feed import backfill
+from content.matching import recipe_match_index
 from content.models import Favourite, Ingredient, Recipe, ShoppingList, Tag
+from content.search import ingredient_index
+from core.cache import cached_reference
+from core.metrics import render_prometheus
 from core.seralizers import BasicRecipeSerializer
 from users.models import Follow, User
 
 
+@method_decorator(cached_reference(Tag), name='list')
+@method_decorator(cached_reference(Tag), name='retrieve')
 class TagViewSet(mixins.ListModelMixin,
                  mixins.RetrieveModelMixin,
                  viewsets.GenericViewSet):
@@ -25,7 +44,17 @@ class TagViewSet(mixins.ListModelMixin,
     permission_classes = (permissions.AllowAny,)
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        return Response(list(self.get_queryset().values(*TAG_FIELDS)))
 
+    def retrieve(self, request, *args, **kwargs):
+        return Response(generics.get_object_or_404(
+            self.get_queryset().values(*TAG_FIELDS), pk=kwargs['pk']
+        ))
+
+
+@method_decorator(cached_reference(Ingredient), name='list')
+@method_decorator(cached_reference(Ingredient), name='retrieve')
 class IngredientViewSet(mixins.ListModelMixin,
                         mixins.RetrieveModelMixin,
                         viewsets.GenericViewSet):
@@ -36,22 +65,47 @@ class IngredientViewSet(mixins.ListModelMixin,
     filterset_class = IngredientFilter
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if not name:
+            return Response(list(self.filter_queryset(
+                self.get_queryset()
+            ).values(*INGREDIENT_FIELDS)))
+        limit = request.query_params.get('limit')
+        return Response(ingredient_index.search(
+            name,
+            limit=int(limit) if limit and limit.isdigit() else None,
+            measurement_unit=request.query_params.get('measurement_unit')
+        ))
+
+    def retrieve(self, request, *args, **kwargs):
+        return Response(generics.get_object_or_404(
+            self.get_queryset().values(*INGREDIENT_FIELDS), pk=kwargs['pk']
+        ))
+
 
 class RecipeViewSet(viewsets.ModelViewSet):
     """Представление для работы с рецептами."""
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
-    pagination_class = LimitPagination
+    pagination_class = RecipePagination
     filterset_class = RecipeFilter
     http_method_names = ('get', 'post', 'patch', 'delete')
 
+    def perform_content_negotiation(self, request, force=False):
+        # Параметр ?format= выбирает формат файла списка покупок,
+        # а не рендерер DRF.
+        if self.action == 'download_shopping_cart':
+            force = True
+        return super().perform_content_negotiation(request, force)
+
     def get_serializer_class(self):
-        if self.action in ('create', 'partial_update'):
+        if self.action in ('create', 'partial_update', 'bulk'):
             return CreateRecipeSerializer
         return RecipeSerializer
 
     def get_permissions(self):
-        if self.action in ('retrieve', 'list'):
+        if self.action in ('retrieve', 'list', 'match'):
             permission_classes = (permissions.AllowAny,)
         elif self.action in ('partial_update', 'destroy'):
             permission_classes = (IsAuthorOrReadOnly,)
@@ -59,6 +113,31 @@ class RecipeViewSet(viewsets.ModelViewSet):
             permission_classes = (permissions.IsAuthenticated,)
         return (permission() for permission in permission_classes)
 
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        etag = get_recipes_etag(request, queryset)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            page = self.paginate_queryset(recipe_rows(queryset))
+            response = self.get_paginated_response(
+                read_recipes(request, page)
+            )
+        return with_etag(response, etag)
+
+    def retrieve(self, request, pk):
+        etag = (
+            get_recipe_etag(request, int(pk)) if str(pk).isdigit() else None
+        )
+        if etag is None:
+            raise Http404
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            rows = list(recipe_rows(self.get_queryset().filter(pk=pk)))
+            if not rows:
+                raise Http404
+            response = Response(read_recipes(request, rows)[0])
+        return with_etag(response, etag)
+
     def create(self, request):
         create_serializer = self.get_serializer(data=request.data)
         create_serializer.is_valid(raise_exception=True)
@@ -71,29 +150,128 @@ class RecipeViewSet(viewsets.ModelViewSet):
             status=status.HTTP_201_CREATED
         )
 
+    @action(detail=False, methods=('POST',),)
+    def bulk(self, request):
+        create_serializer = self.get_serializer(
+            data=request.data, many=True,
+            max_length=settings.RECIPE_BULK_LIMIT
+        )
+        create_serializer.is_valid(raise_exception=True)
+        recipes = create_serializer.save()
+        response_serializer = RecipeSerializer(
+            Recipe.objects.for_feed().filter(
+                id__in=[recipe.id for recipe in recipes]
+            ),
+            many=True, context={'request': request}
+        )
+        return Response(
+            response_serializer.data,
+            status=status.HTTP_201_CREATED
+        )
+
+    @action(detail=False, methods=('GET',),)
+    def feed(self, request):
+        paginator = FeedPagination()
+        page = paginator.paginate_feed(request.user, request)
+        rows = {
+            row['id']: row for row in recipe_rows(
+                Recipe.objects.filter(id__in=[row['id'] for row in page])
+            )
+        }
+        return paginator.get_paginated_response(read_recipes(
+            request, [rows[row['id']] for row in page if row['id'] in rows]
+        ))
+
+    @action(detail=False, methods=('GET',),)
+    def match(self, request):
+        ingredient_ids = [
+            int(pk) for pk in request.query_params.getlist('ingredients')
+            if pk.isdigit()
+        ]
+        if not ingredient_ids:
+            return Response(
+                {'errors': 'Укажите хотя бы один ингредиент.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = request.query_params.get('limit', '')
+        matches = recipe_match_index.match(
+            ingredient_ids,
+            min(int(limit), settings.RECIPE_MATCH_LIMIT)
+            if limit.isdigit() else settings.RECIPE_MATCH_LIMIT
+        )
+        recipes = Recipe.objects.for_feed().in_bulk(
+            [recipe_id for recipe_id, _ in matches]
+        )
+        results = []
+        for recipe_id, coverage in matches:
+            if recipe_id in recipes:
+                recipes[recipe_id].coverage = coverage
+                results.append(recipes[recipe_id])
+        serializer = RecipeMatchSerializer(
+            results, many=True, context={'request': request}
+        )
+        return Response(serializer.data)
+
     @action(detail=True, methods=('POST', 'DELETE'),)
     def favorite(self, request, pk):
         if self.request.method == 'POST':
             return create_obj(request, pk, Favourite, BasicRecipeSerializer)
         return delete_obj(request, pk, Favourite)
 
-    @action(detail=True, methods=('POST', 'DELETE'),)
+    @action(detail=True, methods=('POST', 'PATCH', 'DELETE'),)
     def shopping_cart(self, request, pk):
+        if request.method == 'DELETE':
+            return delete_obj(request, pk, ShoppingList)
+        serializer = ServingsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
         if request.method == 'POST':
-            return create_obj(request, pk, ShoppingList, BasicRecipeSerializer)
-        return delete_obj(request, pk, ShoppingList)
+            return create_obj(
+                request, pk, ShoppingList, BasicRecipeSerializer,
+                **serializer.validated_data
+            )
+        updated = ShoppingList.objects.filter(
+            user=request.user, recipe_id=pk
+        ).update(**serializer.validated_data)
+        if not updated:
+            return Response(
+                {'errors': 'Рецепта нет в списке покупок.'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response({'id': int(pk), **serializer.validated_data})
+
+    def batch(self, request, model):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        apply = create_objs if request.method == 'POST' else delete_objs
+        return Response({'results': apply(
+            request.user, model, 'recipe', serializer.validated_data['ids'],
+            Recipe.objects.all(), model.counter_field
+        )})
+
+    @action(detail=False, methods=('POST', 'DELETE'), url_path='favorite')
+    def favorite_batch(self, request):
+        return self.batch(request, Favourite)
+
+    @action(
+        detail=False, methods=('POST', 'DELETE'), url_path='shopping_cart'
+    )
+    def shopping_cart_batch(self, request):
+        return self.batch(request, ShoppingList)
 
     @action(detail=False, methods=('GET',),)
     def download_shopping_cart(self, request):
-        shopping_list = ShoppingList.objects.filter(user=request.user)
-        if not shopping_list.exists():
+        file_format = request.query_params.get('format', 'txt')
+        if file_format not in SHOPPING_LIST_FORMATS:
+            return Response(
+                {'errors': 'Неподдерживаемый формат файла.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not ShoppingList.objects.filter(user=request.user).exists():
             return Response(
                 {'errors': 'У вас нет добавленных рецептов.'},
                 status=status.HTTP_404_NOT_FOUND
             )
-        recipes_ids = shopping_list.values_list('recipe_id', flat=True)
-        recipes = Recipe.objects.filter(id__in=recipes_ids)
-        return file_create(recipes)
+        return file_create(get_shopping_list(request.user), file_format)
 
 
 class SubscribitionsView(generics.ListAPIView):
@@ -104,40 +282,94 @@ class SubscribitionsView(generics.ListAPIView):
     def get_queryset(self):
         following_ids = Follow.objects.filter(
             user=self.request.user).values_list('following')
-        return User.objects.filter(id__in=following_ids)
+        return User.objects.filter(id__in=following_ids).order_by('id')
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(
+            subscription_rows(self.filter_queryset(self.get_queryset()))
+        )
+        return self.get_paginated_response(read_subscriptions(
+            request, page, get_subscription_recipes(request)
+        ))
 
 
 class SubscribeView(views.APIView):
     """Представление для подписки или отписки от указанного пользователя."""
 
     def post(self, request, id):
-        user = get_object_or_404(User, id=id)
-        if request.user == user:
-            return Response(
-                {'errors': 'Нельзя подписаться на самого себя.'},
-                status=status.HTTP_400_BAD_REQUEST
+        with transaction.atomic():
+            user = get_object_or_404(User.objects.select_for_update(), id=id)
+            if request.user == user:
+                return Response(
+                    {'errors': 'Нельзя подписаться на самого себя.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            _, created = Follow.objects.get_or_create(
+                user=request.user, following=user
             )
-        _, created = Follow.objects.get_or_create(
-            user=request.user, following=user
-        )
         if not created:
             return Response(
                 {'errors': 'Вы уже подписаны на этого пользователя.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         serializer = SubscribeUserSerializer(
-            user, context={'request': request}
+            with_subscription_data(
+                User.objects.filter(id=user.id), request
+            ).get(),
+            context={'request': request}
         )
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def delete(self, request, id):
-        user = get_object_or_404(User, id=id)
-        follow = Follow.objects.filter(
-            user=request.user, following=user).first()
-        if not follow:
+        with transaction.atomic():
+            user = get_object_or_404(User.objects.select_for_update(), id=id)
+            deleted, _ = Follow.objects.filter(
+                user=request.user, following=user
+            ).delete()
+        if not deleted:
             return Response(
                 {'errors': 'Вы не подписаны на этого пользователя.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        follow.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class SubscribeBatchView(views.APIView):
+    """Представление для подписки или отписки от нескольких
+    пользователей одним запросом.
+    """
+
+    def post(self, request):
+        return self.batch(request, create_objs, 'followers_count')
+
+    def delete(self, request):
+        # Счетчик подписчиков уменьшает post_delete подписки.
+        return self.batch(request, delete_objs, None)
+
+    def batch(self, request, apply, counter_field):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = apply(
+            request.user, Follow, 'following',
+            serializer.validated_data['ids'],
+            User.objects.exclude(id=request.user.id), counter_field
+        )
+        # bulk_create не отправляет post_save, ленту дополняем сами.
+        created = [
+            result['id'] for result in results
+            if result['status'] == 'created'
+        ]
+        if created:
+            backfill(request.user.id, created)
+        return Response({'results': results})
+
+
+class MetricsView(views.APIView):
+    """Представление для выгрузки метрик в формате Prometheus."""
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request):
+        return HttpResponse(
+            render_prometheus(),
+            content_type='text/plain; version=0.0.4; charset=utf-8'
+        )
@@ -1,32 +1,86 @@
 from django.contrib import admin
+from django.utils.text import Truncator
 
 from .models import Ingredient, Recipe, RecipeIngredient, Tag
+from .search import search_recipes
+from core.paginators import EstimatedCountPaginator
+
+
+class CookingTimeFilter(admin.SimpleListFilter):
+    """Фильтр по времени приготовления с фиксированными интервалами
+    вместо выборки всех различных значений из таблицы.
+    """
+    title = 'время приготовления'
+    parameter_name = 'cooking_time'
+    ranges = {
+        '15': (None, 15),
+        '30': (16, 30),
+        '60': (31, 60),
+        'long': (61, None),
+    }
+
+    def lookups(self, request, model_admin):
+        return (
+            ('15', 'до 15 минут'),
+            ('30', '16–30 минут'),
+            ('60', '31–60 минут'),
+            ('long', 'больше часа'),
+        )
+
+    def queryset(self, request, queryset):
+        if self.value() not in self.ranges:
+            return queryset
+        start, end = self.ranges[self.value()]
+        if start is not None:
+            queryset = queryset.filter(cooking_time__gte=start)
+        if end is None:
+            return queryset
+        return queryset.filter(cooking_time__lte=end)
 
 
 class RecipeIngredientInline(admin.TabularInline):
     model = RecipeIngredient
     extra = 1
     min_num = 1
+    autocomplete_fields = ('ingredient',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('ingredient')
 
 
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'name', 'text', 'image', 'cooking_time',
-                    'author', 'pub_date',)
+    list_display = ('pk', 'name', 'short_text', 'image', 'cooking_time',
+                    'author', 'pub_date', 'favorites_count',)
+    list_select_related = ('author',)
     search_fields = ('name',)
-    list_filter = ('cooking_time',)
+    list_filter = (CookingTimeFilter,)
+    ordering = ('-pub_date', '-id')
+    autocomplete_fields = ('author',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = '-empty-'
     inlines = (RecipeIngredientInline,)
 
+    @admin.display(description='описание')
+    def short_text(self, obj):
+        return Truncator(obj.text).chars(50)
+
+    def get_search_results(self, request, queryset, search_term):
+        return search_recipes(queryset, search_term), False
+
 
 class TagAdmin(admin.ModelAdmin):
     list_display = ('pk', 'name', 'color', 'slug')
-    search_fields = ('title', 'hex_code')
+    search_fields = ('name', 'slug')
     empty_value_display = '-empty-'
 
 
 class IngedientAdmin(admin.ModelAdmin):
     list_display = ('pk', 'name', 'measurement_unit')
     search_fields = ('name',)
+    ordering = ('name', 'id')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = '-empty-'
 
 
@@ -0,0 +1,106 @@
+import gzip
+import json
+import os
+from functools import partial
+from itertools import chain, islice
+from pathlib import Path
+
+from django.conf import settings
+
+from .images import RENDITION_FORMATS, rendition_name, storage
+
+
+def batches(iterable, size):
+    """Разбивает поток на списки не длиннее size."""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def is_gzip(path):
+    return Path(path).suffix.lower() == '.gz'
+
+
+def read_lines(path):
+    """Построчно читает NDJSON, сжатый gzip или нет."""
+    opener = gzip.open if is_gzip(path) else open
+    with opener(path, 'rt', encoding='utf-8') as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_json_array(file, chunk_size=65536):
+    """Потоково читает объекты из JSON-массива кусками по chunk_size
+    символов, не загружая весь файл в память.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    expected = '['
+    for chunk in chain(iter(partial(file.read, chunk_size), ''), ('',)):
+        buffer += chunk
+        while buffer := buffer.lstrip():
+            if buffer[0] == ']' and expected != '[':
+                return
+            if expected is not None:
+                if buffer[0] != expected:
+                    raise ValueError(f'Ожидался символ {expected!r}.')
+                buffer = buffer[1:]
+                expected = None
+                continue
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise
+                # Объект обрезан границей куска, дочитываем.
+                break
+            yield item
+            buffer = buffer[end:]
+            expected = ','
+    raise ValueError('Массив JSON не закрыт.')
+
+
+def encode_lines(rows, compress):
+    """Кодирует строки в NDJSON. Сжатый блок — отдельный член gzip,
+    поэтому файл можно дописывать после перезапуска.
+    """
+    data = ''.join(
+        json.dumps(row, ensure_ascii=False, separators=(',', ':')) + '\n'
+        for row in rows
+    ).encode()
+    if compress:
+        return gzip.compress(data)
+    return data
+
+
+def read_checkpoint(path):
+    try:
+        with open(path, encoding='utf-8') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def write_checkpoint(path, data):
+    """Атомарно записывает контрольную точку: при сбое остается
+    либо старая, либо новая версия файла.
+    """
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as file:
+        json.dump(data, file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+
+
+def image_files(name):
+    """Возвращает существующие файлы изображения: оригинал
+    и готовые уменьшенные копии.
+    """
+    names = [name] + [
+        rendition_name(name, size, image_format)
+        for size in settings.RECIPE_IMAGE_SIZES
+        for image_format in RENDITION_FORMATS
+    ]
+    return [name for name in names if storage.exists(name)]
@@ -0,0 +1,122 @@
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Q
+
+from .models import FeedEntry, Recipe
+from users.models import Follow, User
+
+
+def _fan_out_authors(author_ids):
+    """Оставляет авторов, рецепты которых раскладываются по лентам
+    при публикации. Ленты подписчиков популярных авторов
+    собираются при чтении.
+    """
+    return set(User.objects.filter(
+        id__in=author_ids,
+        followers_count__lt=settings.FEED_FANOUT_LIMIT
+    ).values_list('id', flat=True))
+
+
+def fan_out(recipes):
+    """Добавляет новые рецепты в ленты подписчиков их авторов."""
+    recipes = [
+        recipe for recipe in recipes
+        if recipe.author.followers_count < settings.FEED_FANOUT_LIMIT
+    ]
+    authors = {recipe.author_id for recipe in recipes}
+    if not recipes:
+        return
+    followers = {}
+    for user_id, author_id in Follow.objects.filter(
+        following__in=authors
+    ).values_list('user_id', 'following_id').iterator():
+        followers.setdefault(author_id, []).append(user_id)
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(
+                user_id=user_id, recipe_id=recipe.id,
+                author_id=recipe.author_id, pub_date=recipe.pub_date
+            )
+            for recipe in recipes
+            for user_id in followers.get(recipe.author_id, ())
+        ),
+        batch_size=settings.FEED_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def backfill(user_id, author_ids):
+    """Добавляет в ленту последние рецепты новых авторов из подписок."""
+    entries = []
+    for author_id in _fan_out_authors(author_ids):
+        entries.extend(
+            FeedEntry(
+                user_id=user_id, recipe_id=recipe_id,
+                author_id=author_id, pub_date=pub_date
+            )
+            for recipe_id, pub_date in Recipe.objects.filter(
+                author_id=author_id
+            ).order_by('-pub_date', '-id').values_list(
+                'id', 'pub_date'
+            )[:settings.FEED_BACKFILL_LIMIT]
+        )
+    FeedEntry.objects.bulk_create(
+        entries, batch_size=settings.FEED_BATCH_SIZE, ignore_conflicts=True
+    )
+
+
+def prune(user_id, author_ids):
+    """Убирает из ленты рецепты авторов, от которых пользователь
+    отписался.
+    """
+    FeedEntry.objects.filter(
+        user_id=user_id, author_id__in=author_ids
+    ).delete()
+
+
+def _before(cursor, pub_date_field, id_field):
+    if cursor is None:
+        return Q()
+    pub_date, pk = cursor
+    return Q(**{f'{pub_date_field}__lt': pub_date}) | Q(**{
+        pub_date_field: pub_date, f'{id_field}__lt': pk
+    })
+
+
+def get_feed(user, limit, cursor=None):
+    """Возвращает до limit строк {'id', 'pub_date'} ленты пользователя
+    от новых рецептов к старым, начиная после cursor = (pub_date, id).
+
+    Записи FeedEntry объединяются с рецептами популярных авторов,
+    которые читаются напрямую по индексу (author, pub_date, id).
+    Записи авторов, ставших популярными после раскладки, отсекаются
+    в запросе: потоки не пересекаются, и повторы не занимают места
+    в срезе.
+    """
+    popular = list(User.objects.filter(
+        id__in=Follow.objects.filter(user=user).values('following'),
+        followers_count__gte=settings.FEED_FANOUT_LIMIT
+    ).values_list('id', flat=True))
+    streams = [list(FeedEntry.objects.filter(user=user).exclude(
+        author__in=popular
+    ).filter(
+        _before(cursor, 'pub_date', 'recipe_id')
+    ).order_by('-pub_date', '-recipe_id').values_list(
+        'pub_date', 'recipe_id'
+    )[:limit])]
+    if popular:
+        streams.append(list(Recipe.objects.filter(
+            author__in=popular
+        ).filter(
+            _before(cursor, 'pub_date', 'id')
+        ).order_by('-pub_date', '-id').values_list(
+            'pub_date', 'id'
+        )[:limit]))
+    return [
+        {'id': pk, 'pub_date': pub_date}
+        for pub_date, pk in islice(
+            heapq.merge(*streams, reverse=True), limit
+        )
+    ]
@@ -0,0 +1,161 @@
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image
+
+from .models import Recipe
+from .storage import ContentAddressedStorage
+
+logger = logging.getLogger(__name__)
+
+RENDITION_FORMATS = {'webp': ('WEBP', 'webp'), 'jpeg': ('JPEG', 'jpg')}
+
+storage = ContentAddressedStorage()
+executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_WORKERS, thread_name_prefix='images'
+)
+# Изображения в очереди или в обработке и рецепты, которым после
+# обработки нужно отметить готовность копий.
+pending = {}
+pending_lock = threading.Lock()
+
+
+def rendition_name(name, size, image_format):
+    """Возвращает имя файла уменьшенной копии изображения."""
+    path = PurePosixPath(name)
+    extension = RENDITION_FORMATS[image_format][1]
+    return str(path.with_name(f'{path.stem}_{size}.{extension}'))
+
+
+def image_name(recipe):
+    """Возвращает имя, под которым изображение рецепта будет сохранено.
+
+    Имя задается содержимым, поэтому его можно узнать до сохранения
+    загруженного файла.
+    """
+    image = recipe.image
+    if image and not image._committed:
+        return image.field.generate_filename(recipe, image.name)
+    return image.name
+
+
+def save_renditions(name):
+    """Создает уменьшенные копии изображения без метаданных."""
+    with storage.open(name) as file, Image.open(file) as image:
+        largest = max(settings.RECIPE_IMAGE_SIZES.values())
+        image.draft('RGB', (largest, largest))
+        image = image.convert('RGB')
+        for size, dimensions in settings.RECIPE_IMAGE_SIZES.items():
+            rendition = image.copy()
+            rendition.thumbnail((dimensions, dimensions))
+            for image_format, (pil_format, _) in RENDITION_FORMATS.items():
+                buffer = BytesIO()
+                rendition.save(
+                    buffer, pil_format, quality=settings.RECIPE_IMAGE_QUALITY
+                )
+                storage.save(
+                    rendition_name(name, size, image_format),
+                    ContentFile(buffer.getvalue())
+                )
+
+
+def make_renditions(name):
+    """Создает копии изображения, если их нет, и отмечает готовность
+    у рецептов из очереди, чье изображение с тех пор не сменилось.
+    """
+    try:
+        if not renditions_ready(name):
+            save_renditions(name)
+        with pending_lock:
+            recipe_ids = pending.pop(name)
+        # Адреса копий входят в ответ, поэтому меняется и ETag рецептов.
+        Recipe.objects.filter(id__in=recipe_ids, image=name).update(
+            renditions_ready=True, updated_at=timezone.now()
+        )
+    except Exception:
+        with pending_lock:
+            pending.pop(name, None)
+        logger.exception('Не удалось обработать изображение %s', name)
+    finally:
+        close_old_connections()
+
+
+def submit_renditions(name, recipe_ids):
+    """Ставит изображение в очередь, если оно еще не обрабатывается:
+    сохранение рецепта при создании и правке, как и одновременные
+    загрузки одного файла, дают одну задачу.
+    """
+    with pending_lock:
+        if name in pending:
+            pending[name].update(recipe_ids)
+            return
+        pending[name] = set(recipe_ids)
+    executor.submit(make_renditions, name)
+
+
+def renditions_ready(name):
+    """Проверяет по файлам, что все уменьшенные копии уже созданы.
+
+    Имя файла задается содержимым, поэтому готовые копии
+    соответствуют изображению и пересоздавать их не нужно.
+    Вызывается только при записи, при чтении готовность берется
+    из поля рецепта.
+    """
+    return all(
+        storage.exists(rendition_name(name, size, image_format))
+        for size in settings.RECIPE_IMAGE_SIZES
+        for image_format in RENDITION_FORMATS
+    )
+
+
+def check_renditions(recipes):
+    """Отмечает перед сохранением рецепты, копии изображений
+    которых уже есть.
+    """
+    ready = {}
+    for recipe in recipes:
+        name = image_name(recipe)
+        if name and name not in ready:
+            ready[name] = renditions_ready(name)
+        recipe.renditions_ready = ready.get(name, False)
+
+
+def schedule_renditions(recipes):
+    """Ставит обработку изображений сохраненных рецептов без готовых
+    копий в очередь после коммита.
+    """
+    names = defaultdict(set)
+    for recipe in recipes:
+        if recipe.image and not recipe.renditions_ready:
+            names[recipe.image.name].add(recipe.id)
+    for name, recipe_ids in names.items():
+        transaction.on_commit(
+            partial(submit_renditions, name, recipe_ids)
+        )
+
+
+def get_rendition_urls(name, ready):
+    """Возвращает адреса копий изображения по размерам и форматам.
+
+    Пока копии не готовы, вместо них отдается оригинал.
+    """
+    if not name:
+        return {}
+    return {
+        size: {
+            image_format: storage.url(
+                rendition_name(name, size, image_format) if ready else name
+            )
+            for image_format in RENDITION_FORMATS
+        }
+        for size in settings.RECIPE_IMAGE_SIZES
+    }
@@ -0,0 +1,37 @@
+from timeit import timeit
+
+from django.core.management.base import BaseCommand
+
+from api.filters import IngredientFilter
+from content.models import Ingredient
+from content.search import ingredient_index
+
+DEFAULT_QUERIES = ('а', 'мо', 'сах', 'кар', 'помидор', 'сыр')
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает скорость поиска ингредиентов фильтром '
+            'и индексом автодополнения.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('queries', nargs='*', default=DEFAULT_QUERIES)
+        parser.add_argument('--repeat', type=int, default=100)
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        ingredient_index.invalidate()
+        ingredient_index.search('')
+        for query in options['queries']:
+            filter_time = timeit(
+                lambda: list(IngredientFilter(
+                    {'name': query}, queryset=Ingredient.objects.all()
+                ).qs.values('id', 'name', 'measurement_unit')),
+                number=repeat
+            )
+            index_time = timeit(
+                lambda: ingredient_index.search(query), number=repeat
+            )
+            self.stdout.write(
+                f'{query}: фильтр {filter_time / repeat * 1000:.3f} мс, '
+                f'индекс {index_time / repeat * 1000:.3f} мс'
+            )
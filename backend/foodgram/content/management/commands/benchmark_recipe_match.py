@@ -0,0 +1,46 @@
+import random
+from timeit import timeit
+
+from django.core.management.base import BaseCommand
+
+from content.matching import RecipeMatchIndex
+
+
+class Command(BaseCommand):
+    help = ('Измеряет скорость подбора рецептов по ингредиентам '
+            'на синтетических данных.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100_000)
+        parser.add_argument('--ingredients', type=int, default=2_200)
+        parser.add_argument('--per-recipe', type=int, default=8)
+        parser.add_argument('--query-size', type=int, default=5)
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=100)
+
+    def handle(self, *args, **options):
+        generator = random.Random(0)
+        ingredient_ids = range(1, options['ingredients'] + 1)
+        rows = [
+            (recipe_id, ingredient_id)
+            for recipe_id in range(1, options['recipes'] + 1)
+            for ingredient_id in generator.sample(
+                ingredient_ids, options['per_recipe']
+            )
+        ]
+        index = RecipeMatchIndex()
+        build_time = timeit(lambda: index.load(rows), number=1)
+        queries = [
+            generator.sample(ingredient_ids, options['query_size'])
+            for _ in range(options['repeat'])
+        ]
+        queries_iter = iter(queries)
+        match_time = timeit(
+            lambda: index.match(next(queries_iter), options['limit']),
+            number=options['repeat']
+        )
+        self.stdout.write(
+            f'Рецептов: {options["recipes"]}, построение индекса: '
+            f'{build_time * 1000:.1f} мс, подбор: '
+            f'{match_time / options["repeat"] * 1000:.3f} мс'
+        )
@@ -0,0 +1,154 @@
+import os
+import tarfile
+from collections import defaultdict
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from content.exchange import (batches, encode_lines, image_files, is_gzip,
+                              read_checkpoint, write_checkpoint)
+from content.images import storage
+from content.models import Recipe, RecipeIngredient
+
+AUTHOR_FIELDS = ('username', 'email', 'first_name', 'last_name')
+TAG_FIELDS = ('name', 'color', 'slug')
+INGREDIENT_FIELDS = ('name', 'measurement_unit')
+IMAGES_SEEN_LIMIT = 100000
+
+
+class Command(BaseCommand):
+    help = ('Выгружает рецепты с ингредиентами, тегами и авторами '
+            'в NDJSON (.gz — со сжатием) потоково, пачками.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument(
+            '--images', help='Tar-архив для файлов изображений.'
+        )
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Продолжить с последней контрольной точки.'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        checkpoint_path = f'{path}.checkpoint'
+        checkpoint = {'last_id': 0, 'offset': 0, 'images_offset': 0}
+        if options['resume']:
+            checkpoint = read_checkpoint(checkpoint_path)
+            if checkpoint is None:
+                raise CommandError(
+                    f'Контрольная точка {checkpoint_path} не найдена.'
+                )
+        output = self.open_output(path, checkpoint['offset'])
+        images = None
+        self.images_seen = set()
+        if options['images']:
+            images = self.open_images(
+                options['images'], checkpoint['images_offset']
+            )
+        total = 0
+        try:
+            recipes = Recipe.objects.filter(
+                id__gt=checkpoint['last_id']
+            ).order_by('id').values(
+                'id', 'name', 'text', 'image', 'cooking_time', 'pub_date',
+                *(f'author__{field}' for field in AUTHOR_FIELDS)
+            ).iterator(chunk_size=options['chunk_size'])
+            for chunk in batches(recipes, options['chunk_size']):
+                output.write(
+                    encode_lines(self.read_chunk(chunk), is_gzip(path))
+                )
+                output.flush()
+                os.fsync(output.fileno())
+                checkpoint['offset'] = output.tell()
+                if images is not None:
+                    self.add_images(images, chunk)
+                    checkpoint['images_offset'] = images.offset
+                checkpoint['last_id'] = chunk[-1]['id']
+                write_checkpoint(checkpoint_path, checkpoint)
+                total += len(chunk)
+                self.stdout.write(f'Выгружено рецептов: {total}')
+        finally:
+            output.close()
+            if images is not None:
+                images.close()
+                images.fileobj.close()
+        Path(checkpoint_path).unlink(missing_ok=True)
+        self.stdout.write(self.style.SUCCESS(
+            f'Выгрузка завершена, рецептов: {total}.'
+        ))
+
+    def open_output(self, path, offset):
+        """Открывает файл выгрузки, отрезая строки, записанные
+        после контрольной точки.
+        """
+        output = open(path, 'r+b' if offset else 'wb')
+        output.truncate(offset)
+        output.seek(offset)
+        return output
+
+    def open_images(self, path, offset):
+        """Открывает архив изображений. При продолжении архив
+        обрезается до контрольной точки и дописывается.
+        """
+        file = open(path, 'r+b' if offset else 'wb')
+        file.truncate(offset)
+        file.seek(offset)
+        return tarfile.open(fileobj=file, mode='w')
+
+    def read_chunk(self, chunk):
+        """Добавляет к строкам рецептов теги и ингредиенты
+        двумя запросами на пачку.
+        """
+        ids = [row['id'] for row in chunk]
+        tags = defaultdict(list)
+        for recipe_id, *values in Recipe.tags.through.objects.filter(
+            recipe_id__in=ids
+        ).order_by('tag_id').values_list(
+            'recipe_id', *(f'tag__{field}' for field in TAG_FIELDS)
+        ):
+            tags[recipe_id].append(dict(zip(TAG_FIELDS, values)))
+        ingredients = defaultdict(list)
+        for recipe_id, amount, *values in RecipeIngredient.objects.filter(
+            recipe_id__in=ids
+        ).order_by('id').values_list(
+            'recipe_id', 'amount',
+            *(f'ingredient__{field}' for field in INGREDIENT_FIELDS)
+        ):
+            ingredients[recipe_id].append(
+                {**dict(zip(INGREDIENT_FIELDS, values)), 'amount': amount}
+            )
+        for row in chunk:
+            yield {
+                'id': row['id'],
+                'name': row['name'],
+                'text': row['text'],
+                'image': row['image'],
+                'cooking_time': row['cooking_time'],
+                'pub_date': row['pub_date'].isoformat(),
+                'author': {
+                    field: row[f'author__{field}'] for field in AUTHOR_FIELDS
+                },
+                'tags': tags[row['id']],
+                'ingredients': ingredients[row['id']],
+            }
+
+    def add_images(self, archive, chunk):
+        """Добавляет в архив изображения пачки. Одно изображение может
+        быть у многих рецептов, поэтому уже добавленные имена
+        запоминаются, но не более IMAGES_SEEN_LIMIT штук.
+        """
+        if len(self.images_seen) > IMAGES_SEEN_LIMIT:
+            self.images_seen.clear()
+        for name in {row['image'] for row in chunk if row['image']}:
+            if name in self.images_seen:
+                continue
+            self.images_seen.add(name)
+            for file_name in image_files(name):
+                info = tarfile.TarInfo(file_name)
+                info.size = storage.size(file_name)
+                with storage.open(file_name) as file:
+                    archive.addfile(info, file)
+        archive.fileobj.flush()
@@ -0,0 +1,238 @@
+import json
+import tarfile
+from collections import Counter
+from itertools import islice
+from pathlib import Path
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from content.exchange import (batches, read_checkpoint, read_lines,
+                              write_checkpoint)
+from content.feed import fan_out
+from content.images import check_renditions, schedule_renditions, storage
+from content.matching import recipe_match_index
+from content.models import Ingredient, Recipe, RecipeIngredient, Tag
+from content.search import ingredient_index, update_search_index
+from core.cache import bump_version
+from core.counters import update_counter
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = ('Загружает рецепты из выгрузки export_recipes пачками, '
+            'сопоставляя авторов, теги и ингредиенты по естественным '
+            'ключам.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--images', help='Tar-архив с файлами изображений.'
+        )
+        parser.add_argument(
+            '--id-map',
+            help='Файл NDJSON для пар [старый id, новый id] рецептов.'
+        )
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Продолжить с последней контрольной точки.'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not Path(path).exists():
+            raise CommandError(f'Файл {path} не найден.')
+        checkpoint_path = f'{path}.import-checkpoint'
+        checkpoint = {'line': 0}
+        if options['resume']:
+            checkpoint = read_checkpoint(checkpoint_path) or checkpoint
+        if options['images']:
+            self.extract_images(options['images'])
+        self.tags = {}
+        self.ingredients = {}
+        id_map = None
+        if options['id_map']:
+            id_map = open(
+                options['id_map'], 'a' if options['resume'] else 'w',
+                encoding='utf-8'
+            )
+        created = skipped = 0
+        try:
+            rows = islice(read_lines(path), checkpoint['line'], None)
+            for batch in batches(rows, options['batch_size']):
+                with transaction.atomic():
+                    mapping, batch_created = self.import_batch(batch)
+                if id_map is not None:
+                    id_map.writelines(
+                        json.dumps(pair) + '\n' for pair in mapping
+                    )
+                    id_map.flush()
+                created += batch_created
+                skipped += len(batch) - len(mapping)
+                checkpoint['line'] += len(batch)
+                write_checkpoint(checkpoint_path, checkpoint)
+                self.stdout.write(f'Обработано строк: {checkpoint["line"]}')
+        finally:
+            if id_map is not None:
+                id_map.close()
+        Path(checkpoint_path).unlink(missing_ok=True)
+        ingredient_index.invalidate()
+        bump_version(Ingredient)
+        bump_version(Tag)
+        self.stdout.write(self.style.SUCCESS(
+            f'Добавлено рецептов: {created}, пропущено (нет автора '
+            f'или повтор): {skipped}.'
+        ))
+
+    def extract_images(self, path):
+        """Сохраняет файлы из архива, которых еще нет в хранилище."""
+        saved = 0
+        with tarfile.open(path, 'r|*') as archive:
+            for member in archive:
+                if not member.isfile() or storage.exists(member.name):
+                    continue
+                with archive.extractfile(member) as file:
+                    storage.save(member.name, ContentFile(file.read()))
+                saved += 1
+        self.stdout.write(f'Сохранено файлов изображений: {saved}')
+
+    def get_authors(self, batch):
+        """Находит авторов по username и создает недостающих
+        с неиспользуемым паролем.
+        """
+        data = {row['author']['username']: row['author'] for row in batch}
+        authors = User.objects.in_bulk(list(data), field_name='username')
+        missing = []
+        for username in data.keys() - authors.keys():
+            user = User(**data[username])
+            user.set_unusable_password()
+            missing.append(user)
+        if not missing:
+            return authors
+        User.objects.bulk_create(missing, ignore_conflicts=True)
+        return User.objects.in_bulk(list(data), field_name='username')
+
+    def get_tags(self, batch):
+        data = {tag['slug']: tag for row in batch for tag in row['tags']}
+        missing = data.keys() - self.tags.keys()
+        if missing:
+            Tag.objects.bulk_create(
+                (Tag(**data[slug]) for slug in missing),
+                ignore_conflicts=True
+            )
+            self.tags.update(Tag.objects.filter(
+                slug__in=missing
+            ).values_list('slug', 'id'))
+        return self.tags
+
+    def get_ingredients(self, batch):
+        data = {
+            (item['name'], item['measurement_unit'])
+            for row in batch for item in row['ingredients']
+        }
+        missing = data - self.ingredients.keys()
+        if missing:
+            Ingredient.objects.bulk_create(
+                (Ingredient(name=name, measurement_unit=unit)
+                 for name, unit in missing),
+                ignore_conflicts=True
+            )
+            for pk, name, unit in Ingredient.objects.filter(
+                name__in={name for name, _ in missing}
+            ).values_list('id', 'name', 'measurement_unit'):
+                if (name, unit) in missing:
+                    self.ingredients[name, unit] = pk
+        return self.ingredients
+
+    def import_batch(self, batch):
+        """Загружает пачку рецептов и возвращает пары
+        [старый id, новый id] и число добавленных рецептов.
+
+        Рецепты, уже загруженные ранее (тот же автор, название и дата
+        публикации), не дублируются, поэтому пачку можно повторить.
+        """
+        authors = self.get_authors(batch)
+        tags = self.get_tags(batch)
+        ingredients = self.get_ingredients(batch)
+        for row in batch:
+            row['pub_date'] = parse_datetime(row['pub_date'])
+        existing = {
+            (author_id, name, pub_date): pk
+            for pk, author_id, name, pub_date in Recipe.objects.filter(
+                author__in=[author.id for author in authors.values()],
+                pub_date__in={row['pub_date'] for row in batch}
+            ).values_list('id', 'author_id', 'name', 'pub_date')
+        }
+        mapping = []
+        new_rows = []
+        recipes = []
+        for row in batch:
+            author = authors.get(row['author']['username'])
+            if author is None:
+                continue
+            key = (author.id, row['name'], row['pub_date'])
+            if key in existing:
+                # None — повтор рецепта внутри самой выгрузки.
+                if existing[key] is not None:
+                    mapping.append((row['id'], existing[key]))
+                continue
+            existing[key] = None
+            new_rows.append(row)
+            recipes.append(Recipe(
+                author=author, name=row['name'], text=row['text'],
+                image=row['image'], cooking_time=row['cooking_time']
+            ))
+        self.create_recipes(recipes, new_rows, tags, ingredients)
+        mapping.extend(
+            (row['id'], recipe.id) for recipe, row in zip(recipes, new_rows)
+        )
+        return mapping, len(recipes)
+
+    def create_recipes(self, recipes, rows, tags, ingredients):
+        """Сохраняет рецепты со связями, как пакетное создание в API."""
+        if not recipes:
+            return
+        if connection.features.can_return_rows_from_bulk_insert:
+            # bulk_create не отправляет сигналы с обработкой изображений.
+            check_renditions(recipes)
+            Recipe.objects.bulk_create(recipes)
+            schedule_renditions(recipes)
+            for author_id, total in Counter(
+                recipe.author_id for recipe in recipes
+            ).items():
+                update_counter(
+                    User.objects.filter(id=author_id), 'recipes_count', total
+                )
+        else:
+            for recipe in recipes:
+                recipe.save()
+        # auto_now_add подменяет дату при вставке, bulk_update ее не трогает.
+        for recipe, row in zip(recipes, rows):
+            recipe.pub_date = row['pub_date']
+        Recipe.objects.bulk_update(recipes, ('pub_date',))
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=recipe.id, tag_id=tags[tag['slug']])
+            for recipe, row in zip(recipes, rows)
+            for tag in row['tags'] if tag['slug'] in tags
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe_id=recipe.id,
+                ingredient_id=ingredients[
+                    item['name'], item['measurement_unit']
+                ],
+                amount=item['amount']
+            )
+            for recipe, row in zip(recipes, rows)
+            for item in row['ingredients']
+        )
+        fan_out(recipes)
+        transaction.on_commit(
+            lambda: update_search_index(recipe.id for recipe in recipes)
+        )
+        transaction.on_commit(lambda: recipe_match_index.update_recipes(
+            recipe.id for recipe in recipes
+        ))
@@ -0,0 +1,109 @@
+import csv
+from io import StringIO
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from content.exchange import read_json_array
+from content.models import Ingredient
+from content.search import ingredient_index
+from core.cache import bump_version
+
+
+class Command(BaseCommand):
+    help = 'Загружает ингредиенты из CSV или JSON файла.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default=settings.INGREDIENTS_PATH,
+            help='По умолчанию — INGREDIENTS_PATH из настроек.'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--copy', action='store_true',
+            help='Загрузка через COPY FROM STDIN (только PostgreSQL).'
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.exists():
+            raise CommandError(
+                f'Файл {path} не найден. Передайте путь аргументом '
+                'или задайте переменную окружения INGREDIENTS_PATH.'
+            )
+        if options['copy'] and connection.vendor != 'postgresql':
+            raise CommandError('Загрузка через COPY доступна для PostgreSQL.')
+        before = Ingredient.objects.count()
+        with path.open(encoding='utf-8') as file:
+            rows = self.read_rows(file, path.suffix.lower())
+            try:
+                if options['copy']:
+                    total = self.copy(rows, options['batch_size'])
+                else:
+                    total = self.bulk_create(rows, options['batch_size'])
+            except ValueError as error:
+                raise CommandError(f'Ошибка в файле {path}: {error}')
+        created = Ingredient.objects.count() - before
+        ingredient_index.invalidate()
+        # Процессы сервера перестраивают индексы по версии в общем кэше.
+        bump_version(Ingredient)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано строк: {total}, добавлено: {created}, '
+            f'пропущено: {total - created}.'
+        ))
+
+    def read_rows(self, file, suffix):
+        if suffix == '.json':
+            for item in read_json_array(file):
+                yield item['name'].strip(), item['measurement_unit'].strip()
+        elif suffix == '.csv':
+            for row in csv.reader(file):
+                if row:
+                    yield row[0].strip(), row[1].strip()
+        else:
+            raise CommandError('Поддерживаются только CSV и JSON файлы.')
+
+    def batches(self, rows, batch_size):
+        while batch := list(islice(rows, batch_size)):
+            yield batch
+
+    def bulk_create(self, rows, batch_size):
+        total = 0
+        for batch in self.batches(rows, batch_size):
+            Ingredient.objects.bulk_create(
+                (Ingredient(name=name, measurement_unit=unit)
+                 for name, unit in batch),
+                ignore_conflicts=True
+            )
+            total += len(batch)
+            self.stdout.write(f'Обработано строк: {total}')
+        return total
+
+    @transaction.atomic
+    def copy(self, rows, batch_size):
+        table = connection.ops.quote_name(Ingredient._meta.db_table)
+        total = 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMP TABLE tmp_ingredient '
+                '(name text, measurement_unit text) ON COMMIT DROP'
+            )
+            for batch in self.batches(rows, batch_size):
+                buffer = StringIO()
+                csv.writer(buffer).writerows(batch)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    'COPY tmp_ingredient (name, measurement_unit) '
+                    'FROM STDIN WITH (FORMAT csv)', buffer
+                )
+                total += len(batch)
+                self.stdout.write(f'Скопировано строк: {total}')
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                'SELECT DISTINCT name, measurement_unit FROM tmp_ingredient '
+                'ON CONFLICT (name, measurement_unit) DO NOTHING'
+            )
+        return total
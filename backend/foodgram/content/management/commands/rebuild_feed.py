@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from content.feed import backfill
+from content.models import FeedEntry
+from users.models import Follow
+
+
+class Command(BaseCommand):
+    help = ('Пересобирает ленты подписок: последние рецепты каждого '
+            'автора из подписок пользователя.')
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        FeedEntry.objects.all().delete()
+        following = {}
+        for user_id, author_id in Follow.objects.values_list(
+            'user_id', 'following_id'
+        ).iterator():
+            following.setdefault(user_id, []).append(author_id)
+        for user_id, author_ids in following.items():
+            backfill(user_id, author_ids)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересобрано лент: {len(following)}, '
+            f'записей: {FeedEntry.objects.count()}.'
+        ))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from content.models import Favourite, Recipe, ShoppingList
+from users.models import Follow, User
+
+
+def count_subquery(queryset, field):
+    """Подзапрос, считающий строки queryset для внешнего объекта."""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+                field
+            ).annotate(total=Count('pk')).values('total'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счетчики рецептов и авторов.'
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.update(
+            favorites_count=count_subquery(Favourite.objects, 'recipe'),
+            in_carts_count=count_subquery(ShoppingList.objects, 'recipe'),
+        )
+        users = User.objects.update(
+            recipes_count=count_subquery(Recipe.objects, 'author'),
+            followers_count=count_subquery(Follow.objects, 'following'),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано рецептов: {recipes}, пользователей: {users}.'
+        ))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from content.models import Recipe
+from content.search import (REINDEX_BATCH_SIZE, reindex_recipes,
+                            unindexed_recipes)
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает поисковый индекс рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=REINDEX_BATCH_SIZE
+        )
+        parser.add_argument(
+            '--missing', action='store_true',
+            help='Только рецепты, которых еще нет в индексе.'
+        )
+
+    def handle(self, *args, **options):
+        queryset = (
+            unindexed_recipes() if options['missing']
+            else Recipe.objects.all()
+        )
+        total = reindex_recipes(queryset, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано рецептов: {total}.'
+        ))
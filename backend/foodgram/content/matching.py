@@ -0,0 +1,122 @@
+import heapq
+import threading
+from collections import defaultdict
+from time import monotonic
+
+from django.conf import settings
+
+from .models import RecipeIngredient
+
+
+class RecipeMatchIndex:
+    """Обратный индекс «ингредиент → рецепты» для подбора рецептов
+    по имеющимся у пользователя ингредиентам.
+
+    Строится лениво при первом запросе, обновляется инкрементально
+    при сохранении и удалении рецептов в текущем процессе и полностью
+    перестраивается раз в RECIPE_MATCH_INDEX_TTL секунд, чтобы учесть
+    изменения из других процессов.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = threading.Condition(self._lock)
+        self._recipes = None
+        self._ingredients = None
+        self._built_at = None
+        self._building = False
+        # Рецепты, измененные во время перестроения индекса.
+        self._changed = set()
+
+    def load(self, rows):
+        """Строит индекс по парам (id рецепта, id ингредиента)."""
+        recipes = defaultdict(set)
+        ingredients = defaultdict(set)
+        for recipe_id, ingredient_id in rows:
+            recipes[recipe_id].add(ingredient_id)
+            ingredients[ingredient_id].add(recipe_id)
+        with self._lock:
+            self._recipes = recipes
+            self._ingredients = ingredients
+            self._built_at = monotonic()
+
+    def _ensure_loaded(self):
+        """Перестраивает устаревший индекс в одном потоке.
+
+        Остальные запросы тем временем работают со старым индексом
+        и ждут, только если индекса еще нет. Запрос к БД и построение
+        выполняются без блокировки, под ней новый индекс лишь
+        подменяет старый.
+        """
+        with self._lock:
+            while self._recipes is None and self._building:
+                self._loaded.wait()
+            if self._building or (
+                self._recipes is not None and monotonic() - self._built_at
+                <= settings.RECIPE_MATCH_INDEX_TTL
+            ):
+                return
+            self._building = True
+        try:
+            self.load(RecipeIngredient.objects.values_list(
+                'recipe_id', 'ingredient_id'
+            ).iterator())
+        finally:
+            with self._lock:
+                self._building = False
+                changed, self._changed = self._changed, set()
+                self._loaded.notify_all()
+        # Изменения, сделанные во время чтения, могли в него не попасть.
+        self.update_recipes(changed)
+
+    def update_recipes(self, recipe_ids):
+        """Обновляет ингредиенты рецептов в индексе."""
+        recipe_ids = list(recipe_ids)
+        with self._lock:
+            if self._building:
+                self._changed.update(recipe_ids)
+            if self._recipes is None or not recipe_ids:
+                return
+        rows = list(RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('recipe_id', 'ingredient_id'))
+        with self._lock:
+            for recipe_id in recipe_ids:
+                self._remove(recipe_id)
+            for recipe_id, ingredient_id in rows:
+                self._recipes[recipe_id].add(ingredient_id)
+                self._ingredients[ingredient_id].add(recipe_id)
+
+    def remove_recipe(self, recipe_id):
+        """Удаляет рецепт из индекса."""
+        with self._lock:
+            if self._building:
+                self._changed.add(recipe_id)
+            if self._recipes is not None:
+                self._remove(recipe_id)
+
+    def _remove(self, recipe_id):
+        for ingredient_id in self._recipes.pop(recipe_id, ()):
+            self._ingredients[ingredient_id].discard(recipe_id)
+
+    def match(self, ingredient_ids, limit):
+        """Возвращает до limit пар (id рецепта, доля найденных
+        ингредиентов), лучшие совпадения первыми.
+        """
+        self._ensure_loaded()
+        hits = defaultdict(int)
+        with self._lock:
+            for ingredient_id in set(ingredient_ids):
+                for recipe_id in self._ingredients.get(ingredient_id, ()):
+                    hits[recipe_id] += 1
+            scored = [
+                (matched / len(self._recipes[recipe_id]), matched, recipe_id)
+                for recipe_id, matched in hits.items()
+            ]
+        return [
+            (recipe_id, coverage)
+            for coverage, _, recipe_id in heapq.nlargest(limit, scored)
+        ]
+
+
+recipe_match_index = RecipeMatchIndex()
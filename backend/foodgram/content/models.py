@@ -1,7 +1,9 @@
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
 
+from .storage import ContentAddressedStorage
 from .validators import validate_hex
 from users.models import User
 
@@ -34,10 +36,36 @@ class Ingredient(models.Model):
         max_length=settings.SHORT_LENGTH
     )
 
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('name', 'measurement_unit'),
+                name='unique_ingredient'
+            ),
+        )
+
     def __str__(self):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    """Набор запросов для рецептов."""
+
+    def for_feed(self):
+        """Подгружает автора, теги и ингредиенты фиксированным
+        числом запросов вне зависимости от размера выборки.
+        """
+        return self.select_related('author').prefetch_related(
+            models.Prefetch('tags', queryset=Tag.objects.order_by('id')),
+            models.Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient'
+                ).order_by('id')
+            )
+        )
+
+
 class Recipe(models.Model):
     """Рецепты."""
     name = models.CharField(
@@ -45,7 +73,8 @@ class Recipe(models.Model):
     )
     text = models.TextField()
     image = models.ImageField(
-        upload_to='images'
+        upload_to='images',
+        storage=ContentAddressedStorage()
     )
     cooking_time = models.PositiveSmallIntegerField(
         validators=(MinValueValidator(1),)
@@ -53,15 +82,53 @@ class Recipe(models.Model):
     author = models.ForeignKey(
         User,
         related_name='recipes',
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False
     )
     tags = models.ManyToManyField(Tag)
     pub_date = models.DateTimeField(
         auto_now_add=True
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_index=True
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False
+    )
+    renditions_ready = models.BooleanField(
+        default=False,
+        editable=False
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ('pub_date',)
+        indexes = (
+            models.Index(
+                fields=('pub_date', 'id'),
+                name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=('-favorites_count', 'id'),
+                name='recipe_popular_idx'
+            ),
+            # Рецепты автора и recipes_limit в подписках.
+            models.Index(
+                fields=('author', 'pub_date', 'id'),
+                name='recipe_author_pub_date_idx'
+            ),
+        )
 
     def __str__(self):
         return self.name
@@ -72,7 +139,8 @@ class RecipeIngredient(models.Model):
     recipe = models.ForeignKey(
         Recipe,
         related_name='recipe_ingredients',
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False
     )
     ingredient = models.ForeignKey(
         Ingredient,
@@ -81,18 +149,31 @@ class RecipeIngredient(models.Model):
     )
     amount = models.PositiveSmallIntegerField()
 
+    class Meta:
+        indexes = (
+            # Покрывающий индекс для суммирования списка покупок.
+            models.Index(
+                fields=('recipe', 'ingredient', 'amount'),
+                name='recipe_ingredient_cover_idx'
+            ),
+        )
+
 
 class Favourite(models.Model):
     """Пользовательский список избранного."""
+    counter_field = 'favorites_count'
+
     user = models.ForeignKey(
         User,
         related_name='liker',
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False
     )
     recipe = models.ForeignKey(
         Recipe,
         related_name='+',
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False
     )
 
     class Meta:
@@ -102,19 +183,34 @@ class Favourite(models.Model):
                 name='unique_favourite'
             ),
         )
+        indexes = (
+            models.Index(
+                fields=('recipe', 'user'),
+                name='favourite_recipe_user_idx'
+            ),
+        )
 
 
 class ShoppingList(models.Model):
     """Пользовательский шоппинг-лист."""
+    counter_field = 'in_carts_count'
+
     user = models.ForeignKey(
         User,
         related_name='shopper',
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False
     )
     recipe = models.ForeignKey(
         Recipe,
         related_name='+',
-        on_delete=models.CASCADE)
+        on_delete=models.CASCADE,
+        db_index=False
+    )
+    servings = models.PositiveSmallIntegerField(
+        default=1,
+        validators=(MinValueValidator(1),)
+    )
 
     class Meta:
         constraints = (
@@ -123,6 +219,58 @@ class ShoppingList(models.Model):
                 name='unique_shopping_list'
             ),
         )
+        indexes = (
+            models.Index(
+                fields=('recipe', 'user'),
+                name='shopping_list_recipe_user_idx'
+            ),
+        )
 
     def __str__(self):
         return f'{self.user.username}: лист покупок'
+
+
+class FeedEntry(models.Model):
+    """Запись ленты рецептов от авторов, на которых подписан
+    пользователь, заполняемая при публикации рецепта.
+    """
+    user = models.ForeignKey(
+        User,
+        related_name='+',
+        on_delete=models.CASCADE,
+        db_index=False
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        related_name='+',
+        on_delete=models.CASCADE
+    )
+    author = models.ForeignKey(
+        User,
+        related_name='+',
+        on_delete=models.CASCADE,
+        db_index=False
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_feed_entry'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date', '-recipe'),
+                name='feed_entry_user_pub_date_idx'
+            ),
+            models.Index(
+                fields=('user', 'author'),
+                name='feed_entry_user_author_idx'
+            ),
+            models.Index(
+                fields=('author',),
+                name='feed_entry_author_idx'
+            ),
+        )
@@ -0,0 +1,218 @@
+import threading
+from bisect import bisect_left
+
+from django.conf import settings
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connection
+from django.db.models import F, FloatField, TextField, Value
+from django.db.models.expressions import RawSQL
+
+from .models import Ingredient, Recipe, RecipeIngredient
+from core.cache import get_version
+
+PREFIX_UPPER_BOUND = chr(0x10FFFF)
+SEARCH_CONFIG = 'russian'
+SEARCH_INDEX_NAME = 'recipe_search_vector_idx'
+FTS_TABLE = 'content_recipe_fts'
+FTS_WEIGHTS = (10.0, 5.0, 1.0)
+REINDEX_BATCH_SIZE = 500
+
+
+class IngredientIndex:
+    """Индекс ингредиентов в памяти для автодополнения по названию.
+
+    Хранит отсортированный массив названий в нижнем регистре и отвечает
+    на запросы бинарным поиском без обращения к БД. Перестраивается
+    лениво при первом запросе после изменения ингредиентов, в том числе
+    в других процессах: индекс помнит версию данных из общего кэша.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._data = None
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._data = None
+
+    def _load(self):
+        version, _ = get_version(Ingredient)
+        data = self._data
+        if data is not None and data[0] == version:
+            return data[1:]
+        generation = self._generation
+        rows = sorted(
+            Ingredient.objects.values_list('id', 'name', 'measurement_unit'),
+            key=lambda row: (row[1].casefold(), row[0])
+        )
+        data = (version, [row[1].casefold() for row in rows], rows)
+        with self._lock:
+            if generation == self._generation:
+                self._data = data
+        return data[1:]
+
+    def search(self, query, limit=None, measurement_unit=None):
+        """Ищет ингредиенты: сначала совпадения по началу названия,
+        затем по подстроке, не более limit результатов.
+        """
+        if limit is None:
+            limit = settings.INGREDIENT_SEARCH_LIMIT
+        keys, rows = self._load()
+        query = query.casefold()
+        start = bisect_left(keys, query)
+        end = bisect_left(keys, query + PREFIX_UPPER_BOUND, start)
+        matches = [
+            row for row in rows[start:end]
+            if measurement_unit is None or row[2] == measurement_unit
+        ][:limit]
+        if len(matches) < limit:
+            for key, row in zip(keys, rows):
+                if (query in key and not key.startswith(query)
+                        and (measurement_unit is None
+                             or row[2] == measurement_unit)):
+                    matches.append(row)
+                    if len(matches) == limit:
+                        break
+        return [
+            {'id': pk, 'name': name, 'measurement_unit': unit}
+            for pk, name, unit in matches
+        ]
+
+
+ingredient_index = IngredientIndex()
+
+
+def _ingredient_names(recipe_ids):
+    names = {recipe_id: [] for recipe_id in recipe_ids}
+    for recipe_id, name in RecipeIngredient.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('recipe_id', 'ingredient__name'):
+        names[recipe_id].append(name)
+    return {recipe_id: ' '.join(items) for recipe_id, items in names.items()}
+
+
+def update_search_index(recipe_ids):
+    """Обновляет поисковый индекс для указанных рецептов.
+
+    В PostgreSQL заполняет поле search_vector, в SQLite перезаписывает
+    строки виртуальной таблицы FTS5.
+    """
+    recipe_ids = list(recipe_ids)
+    ingredients = _ingredient_names(recipe_ids)
+    if connection.vendor == 'postgresql':
+        for recipe_id, names in ingredients.items():
+            Recipe.objects.filter(id=recipe_id).update(search_vector=(
+                SearchVector('name', weight='A', config=SEARCH_CONFIG)
+                + SearchVector(
+                    Value(names, output_field=TextField()),
+                    weight='B', config=SEARCH_CONFIG
+                )
+                + SearchVector('text', weight='C', config=SEARCH_CONFIG)
+            ))
+    elif connection.vendor == 'sqlite':
+        rows = Recipe.objects.filter(id__in=recipe_ids).values_list(
+            'id', 'name', 'text'
+        )
+        with connection.cursor() as cursor:
+            delete_from_search_index(recipe_ids, cursor)
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, ingredients, text) '
+                'VALUES (%s, %s, %s, %s)',
+                [(pk, name, ingredients[pk], text) for pk, name, text in rows]
+            )
+
+
+def unindexed_recipes():
+    """Рецепты, которых еще нет в поисковом индексе."""
+    if connection.vendor == 'postgresql':
+        return Recipe.objects.filter(search_vector__isnull=True)
+    if connection.vendor == 'sqlite':
+        return Recipe.objects.exclude(
+            id__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE}', ())
+        )
+    return Recipe.objects.none()
+
+
+def reindex_recipes(queryset, batch_size=REINDEX_BATCH_SIZE):
+    """Перестраивает поисковый индекс рецептов queryset пачками
+    по возрастанию id и возвращает число обработанных рецептов.
+    """
+    total = 0
+    last_id = 0
+    while ids := list(queryset.filter(id__gt=last_id).order_by(
+        'id'
+    ).values_list('id', flat=True)[:batch_size]):
+        update_search_index(ids)
+        total += len(ids)
+        last_id = ids[-1]
+    return total
+
+
+def delete_from_search_index(recipe_ids, cursor=None):
+    """Удаляет рецепты из таблицы FTS5 (только SQLite)."""
+    if connection.vendor != 'sqlite' or not recipe_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    sql = f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})'
+    if cursor is not None:
+        cursor.execute(sql, recipe_ids)
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(sql, recipe_ids)
+
+
+def _fts_query(value):
+    terms = value.split()
+    return ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+
+def search_recipes(queryset, value):
+    """Фильтрует рецепты по поисковому запросу и сортирует
+    по релевантности.
+    """
+    if not value.split():
+        return queryset
+    if connection.vendor == 'postgresql':
+        query = SearchQuery(value, config=SEARCH_CONFIG)
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        ).order_by('-search_rank', 'id')
+    if connection.vendor == 'sqlite':
+        table = Recipe._meta.db_table
+        weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+        # Соединение с таблицей FTS5: MATCH выполняется один раз,
+        # а не коррелированным подзапросом для каждого рецепта.
+        return queryset.extra(
+            tables=(FTS_TABLE,),
+            where=(
+                f'{FTS_TABLE}.rowid = {table}.id',
+                f'{FTS_TABLE} MATCH %s',
+            ),
+            params=(_fts_query(value),)
+        ).annotate(search_rank=RawSQL(
+            f'-bm25({FTS_TABLE}, {weights})', (), output_field=FloatField()
+        )).order_by('-search_rank', 'id')
+    return queryset.filter(name__icontains=value)
+
+
+def create_search_index(using, **kwargs):
+    """Создает GIN-индекс (PostgreSQL) или таблицу FTS5 (SQLite)."""
+    from django.db import connections
+
+    search_connection = connections[using]
+    table = Recipe._meta.db_table
+    with search_connection.cursor() as cursor:
+        if search_connection.vendor == 'postgresql':
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {SEARCH_INDEX_NAME} '
+                f'ON {table} USING gin (search_vector)'
+            )
+        elif search_connection.vendor == 'sqlite':
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} '
+                'USING fts5(name, ingredients, text, '
+                "tokenize='unicode61 remove_diacritics 2')"
+            )
@@ -0,0 +1,153 @@
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import (post_delete, post_migrate, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+
+from .feed import backfill, prune
+from .images import check_renditions, schedule_renditions
+from .matching import recipe_match_index
+from .models import Ingredient, Recipe, RecipeIngredient, Tag
+from .search import (create_search_index, delete_from_search_index,
+                     ingredient_index, reindex_recipes, unindexed_recipes,
+                     update_search_index)
+from core.cache import bump_version
+from core.counters import update_counter
+from users.models import Follow, User
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_index(sender, **kwargs):
+    """Сбрасывает индекс автодополнения при изменении ингредиентов."""
+    ingredient_index.invalidate()
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_reference_cache(sender, **kwargs):
+    """Сбрасывает закэшированные ответы справочных данных."""
+    bump_version(sender)
+
+
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe_lists(sender, **kwargs):
+    """Меняет ETag списков рецептов после удаления рецепта."""
+    bump_version(sender)
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_data(sender, created, update_fields, **kwargs):
+    """Меняет ETag рецептов после изменения данных их авторов.
+
+    У нового пользователя рецептов еще нет, а время входа
+    и пароль в ответы не попадают.
+    """
+    if created or (
+        update_fields and not update_fields - {'last_login', 'password'}
+    ):
+        return
+    bump_version(sender)
+
+
+@receiver(pre_save, sender=Recipe)
+def check_recipe_image(sender, instance, **kwargs):
+    """Отмечает, готовы ли копии нового или прежнего изображения."""
+    check_renditions((instance,))
+
+
+@receiver(post_save, sender=Recipe)
+def process_recipe_image(sender, instance, **kwargs):
+    """Запускает создание уменьшенных копий изображения рецепта."""
+    schedule_renditions((instance,))
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe(sender, instance, **kwargs):
+    """Обновляет поисковый индекс рецепта после коммита,
+    когда ингредиенты рецепта уже сохранены.
+    """
+    transaction.on_commit(lambda: update_search_index((instance.id,)))
+    transaction.on_commit(
+        lambda: recipe_match_index.update_recipes((instance.id,))
+    )
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_recipe(sender, instance, **kwargs):
+    """Удаляет рецепт из поискового индекса."""
+    delete_from_search_index((instance.id,))
+    recipe_match_index.remove_recipe(instance.id)
+
+
+@receiver(post_save, sender=Ingredient)
+def reindex_ingredient_recipes(sender, instance, created, **kwargs):
+    """Обновляет поисковый индекс рецептов с измененным ингредиентом."""
+    if created:
+        return
+    transaction.on_commit(lambda: reindex_recipes(Recipe.objects.filter(
+        id__in=RecipeIngredient.objects.filter(
+            ingredient=instance
+        ).values('recipe')
+    )))
+
+
+@receiver(post_migrate)
+def create_recipe_search_index(sender, using, **kwargs):
+    """Создает поисковый индекс рецептов после миграций и добавляет
+    в него рецепты, которых там еще нет.
+    """
+    if sender.name == 'content':
+        create_search_index(using)
+        if using == DEFAULT_DB_ALIAS:
+            reindex_recipes(unindexed_recipes())
+
+
+@receiver(post_save, sender=Recipe)
+def count_created_recipe(sender, instance, created, **kwargs):
+    """Увеличивает число рецептов автора при любом способе создания."""
+    if created:
+        update_counter(
+            User.objects.filter(id=instance.author_id), 'recipes_count', 1
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def count_deleted_recipe(sender, instance, **kwargs):
+    """Уменьшает число рецептов автора, в том числе при удалении
+    через админку и каскадом.
+    """
+    update_counter(
+        User.objects.filter(id=instance.author_id), 'recipes_count', -1
+    )
+
+
+@receiver(post_save, sender=Follow)
+def count_created_follow(sender, instance, created, **kwargs):
+    """Увеличивает число подписчиков автора."""
+    if created:
+        update_counter(
+            User.objects.filter(id=instance.following_id),
+            'followers_count', 1
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    """Уменьшает число подписчиков автора, в том числе при удалении
+    подписчика.
+    """
+    update_counter(
+        User.objects.filter(id=instance.following_id), 'followers_count', -1
+    )
+
+
+@receiver(post_save, sender=Follow)
+def backfill_feed(sender, instance, created, **kwargs):
+    """Добавляет в ленту рецепты автора при новой подписке."""
+    if created:
+        backfill(instance.user_id, (instance.following_id,))
+
+
+@receiver(post_delete, sender=Follow)
+def prune_feed(sender, instance, **kwargs):
+    """Убирает из ленты рецепты автора при отписке."""
+    prune(instance.user_id, (instance.following_id,))
@@ -0,0 +1,36 @@
+import os
+from uuid import uuid4
+
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище файлов, имена которых однозначно задаются содержимым.
+
+    Повторная загрузка того же файла не создает копию, а переиспользует
+    уже сохраненный файл.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        """Записывает файл во временный и публикует его жесткой ссылкой.
+
+        FileSystemStorage при FileExistsError повторяет запись под именем
+        из get_available_name, то есть под тем же именем, и зацикливается,
+        если файл появился между exists() и открытием. Здесь существующий
+        файл с тем же именем означает то же содержимое, поэтому гонка
+        завершается возвратом готового имени. Незаписанный до конца файл
+        под итоговым именем никто не увидит.
+        """
+        if self.exists(name):
+            return name
+        temporary = super()._save(f'{name}.{uuid4().hex}.part', content)
+        try:
+            os.link(self.path(temporary), self.path(name))
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(self.path(temporary))
+        return name
@@ -0,0 +1,84 @@
+from django.test import TestCase, override_settings
+
+from .feed import get_feed
+from .models import FeedEntry, Recipe
+from users.models import Follow, User
+
+
+class CountersTest(TestCase):
+    """Счетчики рецептов и подписчиков верны при записи в обход API."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.reader = (
+            User.objects.create_user(
+                username=name, email=f'{name}@example.com',
+                first_name=name, last_name=name, password='pass'
+            )
+            for name in ('author', 'reader')
+        )
+
+    def create_recipe(self):
+        return Recipe.objects.create(
+            author=self.author, name='Рецепт', text='Описание',
+            image='images/recipe.jpg', cooking_time=5
+        )
+
+    def assert_counters(self, recipes_count, followers_count):
+        self.author.refresh_from_db()
+        self.assertEqual(
+            (self.author.recipes_count, self.author.followers_count),
+            (recipes_count, followers_count)
+        )
+
+    def test_recipes(self):
+        recipe = self.create_recipe()
+        self.create_recipe()
+        self.assert_counters(2, 0)
+        recipe.delete()
+        self.assert_counters(1, 0)
+
+    def test_follows(self):
+        follow = Follow.objects.create(user=self.reader, following=self.author)
+        self.assert_counters(0, 1)
+        follow.delete()
+        self.assert_counters(0, 0)
+
+    def test_deleted_follower(self):
+        Follow.objects.create(user=self.reader, following=self.author)
+        self.reader.delete()
+        self.assert_counters(0, 0)
+
+
+class FeedTest(TestCase):
+    """Лента не теряет рецепты автора, ставшего популярным."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.other, cls.reader = (
+            User.objects.create_user(
+                username=name, email=f'{name}@example.com',
+                first_name=name, last_name=name, password='pass'
+            )
+            for name in ('author', 'other', 'reader')
+        )
+        cls.recipes = [
+            Recipe.objects.create(
+                author=author, name='Рецепт', text='Описание',
+                image='images/recipe.jpg', cooking_time=5
+            )
+            for author in (cls.other, cls.author, cls.author)
+        ]
+        for author in (cls.author, cls.other):
+            Follow.objects.create(user=cls.reader, following=author)
+
+    def feed_ids(self):
+        return [row['id'] for row in get_feed(self.reader, 3)]
+
+    def test_feed(self):
+        self.assertEqual(FeedEntry.objects.filter(user=self.reader).count(), 3)
+        expected = [recipe.id for recipe in reversed(self.recipes)]
+        self.assertEqual(self.feed_ids(), expected)
+        User.objects.filter(id=self.author.id).update(followers_count=2)
+        with override_settings(FEED_FANOUT_LIMIT=2):
+            self.assertEqual(self.feed_ids(), expected)
@@ -0,0 +1,100 @@
+import re
+import threading
+
+from django.db.models import Case, F, Value, When
+
+from .models import Ingredient
+from core.cache import get_version
+
+# Единица (без пробелов, в нижнем регистре): (базовая единица, множитель).
+CONVERSIONS = {
+    'г': ('г', 1),
+    'гр': ('г', 1),
+    'гр.': ('г', 1),
+    'кг': ('г', 1000),
+    'мл': ('мл', 1),
+    'л': ('мл', 1000),
+    'ч.л.': ('мл', 5),
+    'ст.л.': ('мл', 15),
+    'стакан': ('мл', 200),
+    'шт': ('шт.', 1),
+    'шт.': ('шт.', 1),
+}
+# Базовая единица: (крупная единица, сколько в ней базовых).
+LARGER_UNITS = {
+    'г': ('кг', 1000),
+    'мл': ('л', 1000),
+}
+
+
+def normalize(unit):
+    """Возвращает базовую единицу и множитель для единицы измерения.
+
+    Единицы, которые нельзя перевести в массу, объем или штуки
+    («по вкусу», «пучок»), остаются сами по себе с множителем 1.
+    """
+    key = re.sub(r'\s+', '', unit.lower())
+    return CONVERSIONS.get(key, (unit, 1))
+
+
+def humanize(total, unit):
+    """Переводит количество в базовых единицах в удобную запись:
+    1500 г — 1.5 кг.
+    """
+    if unit in LARGER_UNITS:
+        larger, size = LARGER_UNITS[unit]
+        if total >= size:
+            value = f'{total / size:.3f}'.rstrip('0').rstrip('.')
+            return value, larger
+    return total, unit
+
+
+class UnitTable:
+    """Таблица перевода единиц ингредиентов в базовые единицы.
+
+    Собирается в памяти по различным единицам измерения ингредиентов
+    и перестраивается после изменения справочника ингредиентов,
+    в том числе в других процессах, по версии данных из общего кэша.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = None
+
+    def _load(self):
+        version, _ = get_version(Ingredient)
+        data = self._data
+        if data is not None and data[0] == version:
+            return data[1]
+        table = {}
+        for unit in Ingredient.objects.order_by().values_list(
+            'measurement_unit', flat=True
+        ).distinct():
+            base, factor = normalize(unit)
+            if (base, factor) != (unit, 1):
+                table[unit] = (base, factor)
+        with self._lock:
+            self._data = (version, table)
+        return table
+
+    def expressions(self, field):
+        """Возвращает выражения БД для базовой единицы и множителя
+        по полю единицы измерения field.
+        """
+        table = self._load()
+        if not table:
+            return F(field), Value(1)
+        base = Case(
+            *(When(**{field: unit}, then=Value(base))
+              for unit, (base, _) in table.items()),
+            default=F(field)
+        )
+        factor = Case(
+            *(When(**{field: unit}, then=Value(factor))
+              for unit, (_, factor) in table.items()),
+            default=Value(1)
+        )
+        return base, factor
+
+
+unit_table = UnitTable()
@@ -0,0 +1,112 @@
+from collections import namedtuple
+
+from content.models import Favourite, Ingredient, Recipe, ShoppingList, Tag
+from users.models import Follow, User
+
+Scenario = namedtuple(
+    'Scenario', ('name', 'method', 'url', 'max_queries', 'auth', 'data'),
+    defaults=(True, None)
+)
+
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABAgMAAABieywaAAAA'
+    'CVBMVEUAAAD///9fX1/S0ecCAAAACXBIWXMAAA7EAAAOxAGVKw4bAAAACklEQVQImWNo'
+    'AAAAggCByxOyYQAAAABJRU5ErkJggg=='
+)
+
+
+def load_fixtures():
+    """Выбирает из тестовых данных пользователя с подписками и списком
+    покупок и данные для сценариев.
+
+    Возвращает (None, None), если тестовых данных нет.
+    """
+    user = User.objects.filter(
+        id__in=Follow.objects.values('user')
+    ).filter(
+        id__in=ShoppingList.objects.values('user')
+    ).first()
+    recipe = Recipe.objects.exclude(
+        id__in=Favourite.objects.filter(user=user).values('recipe')
+    ).first()
+    if user is None or recipe is None:
+        return None, None
+    tag = Tag.objects.first()
+    return user, {
+        'recipe': recipe.id,
+        'author': recipe.author_id,
+        'ingredient': Ingredient.objects.values_list(
+            'id', flat=True
+        ).first(),
+        'tag': tag.slug,
+        'tag_id': tag.id,
+        'prefix': Ingredient.objects.values_list(
+            'name', flat=True
+        ).first()[:3],
+    }
+
+
+def get_scenarios(fixtures):
+    """Возвращает сценарии нагрузочного тестирования API.
+
+    fixtures содержит id рецепта, автора, ингредиента, слаг тега
+    и префикс названия ингредиента из тестовых данных.
+    """
+    recipe = fixtures['recipe']
+    return (
+        Scenario('recipes_list_anonymous', 'get', '/api/recipes/', 5, False),
+        Scenario('recipes_list', 'get', '/api/recipes/', 6),
+        Scenario(
+            'recipes_list_favorited', 'get',
+            '/api/recipes/?is_favorited=1', 5
+        ),
+        Scenario(
+            'recipes_list_in_cart', 'get',
+            '/api/recipes/?is_in_shopping_cart=1', 5
+        ),
+        Scenario(
+            'recipes_list_author', 'get',
+            f'/api/recipes/?author={fixtures["author"]}', 5
+        ),
+        Scenario(
+            'recipes_list_tags', 'get',
+            f'/api/recipes/?tags={fixtures["tag"]}', 6
+        ),
+        Scenario(
+            'recipes_list_popular', 'get',
+            '/api/recipes/?ordering=popular', 6
+        ),
+        Scenario(
+            'recipes_list_search', 'get', '/api/recipes/?search=рецепт', 5
+        ),
+        Scenario('recipes_list_cursor', 'get', '/api/recipes/?cursor=', 4),
+        Scenario('recipe_detail', 'get', f'/api/recipes/{recipe}/', 4),
+        Scenario(
+            'recipe_create', 'post', '/api/recipes/', 14, data={
+                'ingredients': [{'id': fixtures['ingredient'], 'amount': 10}],
+                'tags': [fixtures['tag_id']],
+                'image': IMAGE,
+                'name': 'Рецепт',
+                'text': 'Описание',
+                'cooking_time': 10,
+            }
+        ),
+        Scenario(
+            'favorite_add', 'post', f'/api/recipes/{recipe}/favorite/', 8
+        ),
+        Scenario(
+            'favorite_remove', 'delete',
+            f'/api/recipes/{recipe}/favorite/', 6
+        ),
+        Scenario('subscriptions', 'get', '/api/users/subscriptions/', 4),
+        Scenario('feed', 'get', '/api/recipes/feed/', 6),
+        Scenario(
+            'ingredient_search', 'get',
+            f'/api/ingredients/?name={fixtures["prefix"]}', 1, False
+        ),
+        # Третий запрос — таблица единиц измерения при первом обращении.
+        Scenario(
+            'download_shopping_cart', 'get',
+            '/api/recipes/download_shopping_cart/', 3
+        ),
+    )
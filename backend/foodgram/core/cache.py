@@ -0,0 +1,110 @@
+from functools import wraps
+from hashlib import md5
+from time import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .compression import get_encoding
+from .renderers import FastJSONRenderer
+
+VERSION_KEY = 'version:{}'
+MODIFIED_KEY = 'modified:{}'
+RESPONSE_KEY = 'response:{}'
+
+
+def get_label(model, field=None):
+    label = model._meta.label_lower
+    return f'{label}.{field}' if field else label
+
+
+def initial_version():
+    """Начальная версия — время в миллисекундах: если общий кэш вытеснит
+    ключ, новая версия не совпадет ни с одной из выданных раньше.
+    """
+    return int(time() * 1000)
+
+
+def get_version(model, field=None):
+    """Возвращает версию данных модели и время их изменения.
+
+    С field — версию одного поля (например, счетчика), которая
+    меняется отдельно от версии остальных данных модели.
+    """
+    label = get_label(model, field)
+    values = cache.get_many(
+        (VERSION_KEY.format(label), MODIFIED_KEY.format(label))
+    )
+    version = values.get(VERSION_KEY.format(label))
+    modified = values.get(MODIFIED_KEY.format(label))
+    if version is None or modified is None:
+        modified = int(time())
+        version = initial_version()
+        cache.add(VERSION_KEY.format(label), version, None)
+        cache.add(MODIFIED_KEY.format(label), modified, None)
+        version = cache.get(VERSION_KEY.format(label), version)
+        modified = cache.get(MODIFIED_KEY.format(label), modified)
+    return version, modified
+
+
+def bump_version(model, field=None):
+    """Инвалидирует закэшированные ответы модели после коммита."""
+    label = get_label(model, field)
+
+    def bump():
+        cache.add(VERSION_KEY.format(label), initial_version(), None)
+        try:
+            cache.incr(VERSION_KEY.format(label))
+        except ValueError:
+            cache.set(VERSION_KEY.format(label), initial_version(), None)
+        cache.set(MODIFIED_KEY.format(label), int(time()), None)
+
+    transaction.on_commit(bump)
+
+
+def make_etag(request, *parts):
+    """Возвращает сильный ETag представления из частей его версии.
+
+    Учитывает сжатие, которое выберет CompressionMiddleware, чтобы
+    сжатые и несжатые ответы имели разные ETag.
+    """
+    return quote_etag(md5(
+        ':'.join(map(str, (*parts, get_encoding(request)))).encode()
+    ).hexdigest())
+
+
+def cached_reference(model):
+    """Декоратор представления справочных данных: хранит готовый JSON
+    в кэше по версии модели и отвечает 304 на условные запросы.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            version, modified = get_version(model)
+            etag = make_etag(request, version, request.get_full_path())
+            response = get_conditional_response(
+                request, etag=etag, last_modified=modified
+            )
+            if response is None:
+                key = RESPONSE_KEY.format(etag)
+                content = cache.get(key)
+                if content is None:
+                    response = view_func(request, *args, **kwargs)
+                    if response.status_code != 200:
+                        return response
+                    content = FastJSONRenderer().render(response.data)
+                    cache.set(key, content, settings.REFERENCE_CACHE_TIMEOUT)
+                response = HttpResponse(
+                    content, content_type='application/json'
+                )
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(modified)
+            # CompressionMiddleware не добавляет Vary к ответу 304.
+            patch_vary_headers(response, ('Accept-Encoding',))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Кэши, данные которых видны только своему процессу.
+LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Требует общий кэш: в нем хранятся версии данных, по которым
+    все процессы меняют ETag и перестраивают индексы в памяти.
+    """
+    if settings.CACHES['default']['BACKEND'] not in LOCAL_CACHES:
+        return []
+    return [Error(
+        'Кэш по умолчанию не общий для процессов: изменения из команд '
+        'управления и других воркеров не сбросят ETag и индексы.',
+        hint='Задайте CACHE_URL, например pymemcache://memcached:11211.',
+        id='core.E001',
+    )]
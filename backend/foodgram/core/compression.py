@@ -0,0 +1,71 @@
+import gzip
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/plain', 'text/csv')
+
+
+def get_encoding(request):
+    """Выбирает сжатие ответа по Accept-Encoding: br, если доступен
+    brotli, затем gzip. None — ответ отдается без сжатия.
+    """
+    accepted = set()
+    for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        coding, *params = part.split(';')
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(coding.strip().lower())
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress(content, encoding):
+    if encoding == 'br':
+        return brotli.compress(content, quality=settings.COMPRESS_BR_QUALITY)
+    return gzip.compress(
+        content, compresslevel=settings.COMPRESS_GZIP_LEVEL, mtime=0
+    )
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Сжимает ответы API в gzip или brotli.
+
+    В отличие от GZipMiddleware не ослабляет ETag: представления,
+    выдающие ETag, учитывают выбранное сжатие через get_encoding.
+    """
+
+    def process_response(self, request, response):
+        content_type = response.get('Content-Type', '').split(';')[0]
+        if response.streaming or content_type not in COMPRESSIBLE_TYPES:
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if (response.has_header('Content-Encoding')
+                or len(response.content) < settings.COMPRESS_MIN_LENGTH):
+            return response
+        encoding = get_encoding(request)
+        if encoding is None:
+            return response
+        content = compress(response.content, encoding)
+        if len(content) >= len(response.content):
+            return response
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        response['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,13 @@
+from django.db.models import F
+
+from .cache import bump_version
+
+
+def update_counter(queryset, field, delta):
+    """Функция для атомарного изменения денормализованного счетчика.
+
+    Меняет версию счетчика, от которой зависят ETag списков,
+    отсортированных по нему.
+    """
+    queryset.update(**{field: F(field) + delta})
+    bump_version(queryset.model, field)
@@ -0,0 +1,66 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from functools import wraps
+from time import perf_counter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connection, connections
+
+from .metrics import increment, query_collector
+
+# Пул потоков для асинхронных представлений: каждый поток держит свое
+# постоянное соединение (CONN_MAX_AGE), так что размер пула ограничивает
+# число соединений процесса с БД.
+pool = ThreadPoolExecutor(
+    settings.DB_POOL_SIZE, thread_name_prefix='db-pool'
+) if settings.DB_POOL_SIZE else None
+
+
+def check_connections(**kwargs):
+    """Проверяет переиспользуемые соединения перед запросом.
+
+    Замена CONN_HEALTH_CHECKS из Django 4.1: при DB_CONN_HEALTH_CHECKS
+    оборванное соединение закрывается до первого запроса к БД,
+    и вместо ошибки открывается новое.
+    """
+    for conn in connections.all():
+        if conn.connection is None:
+            continue
+        if settings.DB_CONN_HEALTH_CHECKS and not conn.is_usable():
+            increment('db_connections_unusable')
+            conn.close()
+            continue
+        increment('db_connections_reused')
+
+
+def database_sync_to_async(func):
+    """Выполняет синхронную работу с БД в пуле потоков.
+
+    В отличие от sync_to_async(thread_sensitive=True) запросы разных
+    клиентов не выстраиваются в очередь к одному потоку. Соединения
+    рабочего потока проверяются и закрываются по тем же правилам, что
+    в начале и конце обычного HTTP-запроса, а запросы и ожидание
+    свободного потока попадают в метрики текущего HTTP-запроса.
+    """
+    @wraps(func)
+    def wrapper(submitted, *args, **kwargs):
+        collector = query_collector.get()
+        if collector is not None:
+            collector.db_wait += perf_counter() - submitted
+        close_old_connections()
+        check_connections()
+        try:
+            with ExitStack() as stack:
+                if collector is not None:
+                    stack.enter_context(connection.execute_wrapper(collector))
+                return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    bridge = sync_to_async(wrapper, thread_sensitive=False, executor=pool)
+
+    @wraps(func)
+    async def run(*args, **kwargs):
+        return await bridge(perf_counter(), *args, **kwargs)
+    return run
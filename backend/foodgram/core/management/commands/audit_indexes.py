@@ -0,0 +1,102 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from rest_framework.test import APIClient
+
+from core.benchmarks import get_scenarios, load_fixtures
+
+POSTGRESQL_SEQ_SCAN = re.compile(r'Seq Scan on (\w+)')
+SQLITE_SEQ_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?! USING)(?:$| AS )')
+SQLITE_SUBQUERY = re.compile(r'^(?:CO-ROUTINE|MATERIALIZE) (\w+)')
+
+
+class Command(BaseCommand):
+    help = ('Выполняет EXPLAIN для всех SELECT-запросов, которые API '
+            'выполняет в сценариях нагрузочного тестирования, и сообщает '
+            'о последовательном чтении таблиц.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--exclude-table', action='append', default=[],
+            help='Таблица, полное чтение которой допустимо (справочник).'
+        )
+        parser.add_argument(
+            '--strict', action='store_true',
+            help='Завершиться ошибкой, если найдено полное чтение таблиц.'
+        )
+        parser.add_argument('scenarios', nargs='*')
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            raise CommandError(
+                f'EXPLAIN для {connection.vendor} не поддерживается.'
+            )
+        user, fixtures = load_fixtures()
+        if user is None:
+            raise CommandError(
+                'Нет тестовых данных, выполните manage.py generate_data.'
+            )
+        found = 0
+        with transaction.atomic():
+            for scenario in get_scenarios(fixtures):
+                if (options['scenarios']
+                        and scenario.name not in options['scenarios']):
+                    continue
+                for sql, tables in self.audit_scenario(scenario, user):
+                    tables -= set(options['exclude_table'])
+                    if not tables:
+                        continue
+                    found += 1
+                    self.stdout.write(
+                        f'SEQ SCAN {scenario.name}: '
+                        f'{", ".join(sorted(tables))}\n    {sql}'
+                    )
+            transaction.set_rollback(True)
+        self.stdout.write(f'Запросов с полным чтением таблиц: {found}.')
+        if found and options['strict']:
+            raise CommandError('Найдено полное чтение таблиц.')
+
+    def audit_scenario(self, scenario, user):
+        """Выполняет сценарий, собирает SELECT-запросы и возвращает
+        для каждого уникального запроса таблицы, читаемые целиком.
+        """
+        queries = {}
+
+        def capture(execute, sql, params, many, context):
+            if sql.lstrip().upper().startswith('SELECT'):
+                queries.setdefault(sql, params)
+            return execute(sql, params, many, context)
+
+        client = APIClient()
+        if scenario.auth:
+            client.force_authenticate(user)
+        with connection.execute_wrapper(capture):
+            response = getattr(client, scenario.method)(
+                scenario.url, scenario.data, format='json'
+            )
+            if response.streaming:
+                b''.join(response.streaming_content)
+        return [
+            (sql, self.explain(sql, params)) for sql, params in queries.items()
+        ]
+
+    def explain(self, sql, params):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(f'EXPLAIN {sql}', params)
+                return {
+                    table for line, in cursor.fetchall()
+                    for table in POSTGRESQL_SEQ_SCAN.findall(line)
+                }
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            details = [detail for *_, detail in cursor.fetchall()]
+        # Подзапросы SQLite тоже читаются через SCAN, но это не таблицы.
+        subqueries = {
+            match.group(1) for detail in details
+            if (match := SQLITE_SUBQUERY.match(detail))
+        }
+        return {
+            match.group(1) for detail in details
+            if (match := SQLITE_SEQ_SCAN.match(detail))
+        } - subqueries
@@ -0,0 +1,95 @@
+import json
+from statistics import mean, median
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.status import is_success
+from rest_framework.test import APIClient
+
+from core.benchmarks import get_scenarios, load_fixtures
+
+
+class Command(BaseCommand):
+    help = ('Прогоняет сценарии нагрузочного тестирования API, проверяет '
+            'число SQL-запросов и сохраняет результаты в JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--output', default='benchmark.json')
+        parser.add_argument('scenarios', nargs='*')
+
+    def handle(self, *args, **options):
+        user, fixtures = load_fixtures()
+        if user is None:
+            raise CommandError(
+                'Нет тестовых данных, выполните manage.py generate_data.'
+            )
+        scenarios = [
+            scenario for scenario in get_scenarios(fixtures)
+            if not options['scenarios']
+            or scenario.name in options['scenarios']
+        ]
+        results = {}
+        failed = []
+        with transaction.atomic():
+            for scenario in scenarios:
+                result = self.run_scenario(scenario, user, options['repeat'])
+                results[scenario.name] = result
+                status = 'OK'
+                if (
+                    not is_success(result['status'])
+                    or result['queries'] > scenario.max_queries
+                ):
+                    status = 'FAIL'
+                    failed.append(scenario.name)
+                self.stdout.write(
+                    f'{status} {scenario.name}: {result["median_ms"]:.2f} мс, '
+                    f'запросов {result["queries"]}/{scenario.max_queries}, '
+                    f'ответ {result["status"]}'
+                )
+            transaction.set_rollback(True)
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+        if failed:
+            raise CommandError(
+                'Ответ не 2xx или превышено число запросов: '
+                f'{", ".join(failed)}.'
+            )
+
+    def run_scenario(self, scenario, user, repeat):
+        client = APIClient()
+        if scenario.auth:
+            client.force_authenticate(user)
+        if scenario.method == 'delete':
+            client.post(scenario.url)
+        timings = []
+        queries = 0
+        # Первый ответ не 2xx, иначе последний ответ.
+        status_code = None
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as context:
+                start = perf_counter()
+                response = getattr(client, scenario.method)(
+                    scenario.url, scenario.data, format='json'
+                )
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                timings.append(perf_counter() - start)
+            queries = max(queries, len(context))
+            if status_code is None or is_success(status_code):
+                status_code = response.status_code
+            if scenario.method == 'post' and 'favorite' in scenario.url:
+                client.delete(scenario.url)
+            elif scenario.method == 'delete':
+                client.post(scenario.url)
+        timings.sort()
+        return {
+            'status': status_code,
+            'queries': queries,
+            'mean_ms': mean(timings) * 1000,
+            'median_ms': median(timings) * 1000,
+            'p95_ms': timings[int(len(timings) * 0.95) - 1] * 1000,
+            'max_ms': timings[-1] * 1000,
+        }
@@ -0,0 +1,90 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from statistics import median
+from time import perf_counter
+from urllib.error import URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+
+from content.models import Ingredient, Recipe
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность запущенных WSGI- и '
+            'ASGI-серверов на эндпоинтах чтения при параллельных клиентах.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi', default='http://127.0.0.1:8000')
+        parser.add_argument('--asgi', default='http://127.0.0.1:8001')
+        parser.add_argument('--clients', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--token', help='Токен для списка покупок.')
+        parser.add_argument('--output', default='benchmark_servers.json')
+
+    def handle(self, *args, **options):
+        recipe = Recipe.objects.values_list('id', flat=True).first()
+        prefix = Ingredient.objects.values_list('name', flat=True).first()
+        if recipe is None or prefix is None:
+            raise CommandError(
+                'Нет тестовых данных, выполните manage.py generate_data.'
+            )
+        paths = {
+            'recipes_list': '/api/recipes/',
+            'recipe_detail': f'/api/recipes/{recipe}/',
+            'tags_list': '/api/tags/',
+            'ingredient_search': (
+                f'/api/ingredients/?{urlencode({"name": prefix[:3]})}'
+            ),
+        }
+        if options['token']:
+            paths['download_shopping_cart'] = (
+                '/api/recipes/download_shopping_cart/'
+            )
+        results = {}
+        for server in ('wsgi', 'asgi'):
+            results[server] = {}
+            for name, path in paths.items():
+                result = self.run_load(
+                    options[server].rstrip('/') + path, options
+                )
+                results[server][name] = result
+                self.stdout.write(
+                    f'{server} {name}: {result["rps"]:.1f} запр/с, '
+                    f'медиана {result["median_ms"]:.2f} мс, '
+                    f'p95 {result["p95_ms"]:.2f} мс, '
+                    f'ошибок {result["errors"]}'
+                )
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+
+    def run_load(self, url, options):
+        headers = {}
+        if options['token'] and 'shopping_cart' in url:
+            headers['Authorization'] = f'Token {options["token"]}'
+
+        def fetch(_):
+            start = perf_counter()
+            try:
+                with urlopen(Request(url, headers=headers)) as response:
+                    response.read()
+            except (URLError, OSError):
+                return None
+            return perf_counter() - start
+
+        start = perf_counter()
+        with ThreadPoolExecutor(options['clients']) as executor:
+            timings = list(executor.map(fetch, range(options['requests'])))
+        elapsed = perf_counter() - start
+        errors = timings.count(None)
+        timings = sorted(timing for timing in timings if timing is not None)
+        if not timings:
+            raise CommandError(f'Сервер не отвечает: {url}.')
+        return {
+            'rps': len(timings) / elapsed,
+            'errors': errors,
+            'median_ms': median(timings) * 1000,
+            'p95_ms': timings[int(len(timings) * 0.95) - 1] * 1000,
+            'max_ms': timings[-1] * 1000,
+        }
@@ -0,0 +1,152 @@
+import random
+from io import BytesIO
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from PIL import Image
+
+from content.models import (Favourite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingList, Tag)
+from content.search import update_search_index
+from users.models import Follow, User
+
+TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+)
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = 'Создает тестовые данные для нагрузочного тестирования.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--follows', type=int, default=10)
+        parser.add_argument('--favorites', type=int, default=20)
+        parser.add_argument('--cart', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        generator = random.Random(options['seed'])
+        call_command('load_ingredients', stdout=self.stdout)
+        for name, color, slug in TAGS:
+            Tag.objects.get_or_create(
+                slug=slug, defaults={'name': name, 'color': color}
+            )
+        users = self.create_users(options['users'])
+        recipes = self.create_recipes(users, options, generator)
+        user_ids = [user.id for user in users]
+        self.link(
+            Follow, 'following_id', user_ids,
+            user_ids, options['follows'], generator
+        )
+        self.link(
+            Favourite, 'recipe_id', user_ids,
+            recipes, options['favorites'], generator
+        )
+        self.link(
+            ShoppingList, 'recipe_id', user_ids,
+            recipes, options['cart'], generator
+        )
+        call_command('recount', stdout=self.stdout)
+        call_command('rebuild_feed', stdout=self.stdout)
+        for start in range(0, len(recipes), BATCH_SIZE):
+            update_search_index(recipes[start:start + BATCH_SIZE])
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {len(users)}, '
+            f'рецептов: {len(recipes)}.'
+        ))
+
+    def create_users(self, count):
+        first_id = (User.objects.order_by('-id').values_list(
+            'id', flat=True
+        ).first() or 0) + 1
+        password = make_password('password')
+        User.objects.bulk_create(
+            (User(
+                username=f'user{number}',
+                email=f'user{number}@example.com',
+                first_name='Имя',
+                last_name='Фамилия',
+                password=password,
+            ) for number in range(first_id, first_id + count)),
+            batch_size=BATCH_SIZE
+        )
+        return list(User.objects.filter(id__gte=first_id))
+
+    def create_image(self):
+        buffer = BytesIO()
+        Image.new('RGB', (600, 400), '#E26C2D').save(buffer, 'JPEG')
+        field = Recipe._meta.get_field('image')
+        return field.storage.save(
+            'images/benchmark.jpg', ContentFile(buffer.getvalue())
+        )
+
+    def create_recipes(self, users, options, generator):
+        image = self.create_image()
+        ingredient_ids = list(
+            Ingredient.objects.values_list('id', flat=True)
+        )
+        tags = list(Tag.objects.all())
+        last_id = Recipe.objects.order_by('-id').values_list(
+            'id', flat=True
+        ).first() or 0
+        Recipe.objects.bulk_create(
+            (Recipe(
+                name=f'Рецепт {number}',
+                text='Описание рецепта. ' * 20,
+                image=image,
+                cooking_time=generator.randint(5, 120),
+                author=generator.choice(users),
+            ) for number in range(options['recipes'])),
+            batch_size=BATCH_SIZE
+        )
+        recipes = list(Recipe.objects.filter(id__gt=last_id).values_list(
+            'id', flat=True
+        ))
+        Recipe.tags.through.objects.bulk_create(
+            (Recipe.tags.through(recipe_id=recipe_id, tag=tag)
+             for recipe_id in recipes
+             for tag in generator.sample(tags, generator.randint(1, 2))),
+            batch_size=BATCH_SIZE
+        )
+        per_recipe = options['ingredients_per_recipe']
+        RecipeIngredient.objects.bulk_create(
+            (
+                RecipeIngredient(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredient_id,
+                    amount=generator.randint(1, 500)
+                )
+                for recipe_id in recipes
+                for ingredient_id in generator.sample(
+                    ingredient_ids, per_recipe
+                )
+            ),
+            batch_size=BATCH_SIZE
+        )
+        return recipes
+
+    def link(self, model, field, user_ids, targets, count, generator):
+        rows = []
+        for user_id in user_ids:
+            candidates = [
+                target for target in generator.sample(
+                    targets, min(count + 1, len(targets))
+                ) if target != user_id or field != 'following_id'
+            ][:count]
+            rows.extend(
+                model(user_id=user_id, **{field: target})
+                for target in candidates
+            )
+        model.objects.bulk_create(
+            rows, batch_size=BATCH_SIZE, ignore_conflicts=True
+        )
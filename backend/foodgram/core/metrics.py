@@ -0,0 +1,117 @@
+from collections import Counter, defaultdict, deque
+from contextvars import ContextVar
+from statistics import quantiles
+from threading import Lock
+from time import perf_counter
+
+from django.conf import settings
+
+QUANTILES = (0.5, 0.95, 0.99)
+SUMMARY_FIELDS = (
+    ('request_duration_seconds', 'total'),
+    ('db_duration_seconds', 'db_time'),
+    ('db_pool_wait_seconds', 'db_wait'),
+    ('render_duration_seconds', 'render_time'),
+    ('db_queries', 'queries'),
+)
+
+COUNTERS = (
+    'db_connections_opened',
+    'db_connections_reused',
+    'db_connections_unusable',
+)
+
+# Буфер последних запросов — только для квантилей. Число запросов
+# и суммы копятся отдельно и не уменьшаются, как требует Prometheus.
+records = deque(maxlen=settings.METRICS_BUFFER_SIZE)
+counters = Counter()
+request_totals = Counter()
+summary_totals = Counter()
+counters_lock = Lock()
+query_collector = ContextVar('query_collector', default=None)
+
+
+class QueryCollector:
+    """Обертка выполнения SQL, считающая запросы и их время.
+
+    Подключается через connection.execute_wrapper в том потоке,
+    где выполняются запросы текущего HTTP-запроса.
+    """
+
+    def __init__(self):
+        self.queries = Counter()
+        self.db_time = 0.0
+        self.db_wait = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += perf_counter() - start
+            self.queries[sql] += 1
+
+
+def record(**values):
+    """Сохраняет метрики запроса в кольцевой буфер и счетчики."""
+    records.append(values)
+    key = (values['view'], values['method'])
+    with counters_lock:
+        request_totals[(*key, values['status'])] += 1
+        for _, field in SUMMARY_FIELDS:
+            summary_totals[(*key, field)] += values[field]
+
+
+def increment(name):
+    """Увеличивает счетчик процесса, например открытых соединений с БД."""
+    with counters_lock:
+        counters[name] += 1
+
+
+def _labels(view, method):
+    view = view.replace('\\', '\\\\').replace('"', '\\"')
+    return f'view="{view}",method="{method}"'
+
+
+def render_prometheus():
+    """Возвращает метрики в текстовом формате Prometheus."""
+    groups = defaultdict(list)
+    for item in list(records):
+        groups[(item['view'], item['method'])].append(item)
+    with counters_lock:
+        request_counts = dict(request_totals)
+        totals = dict(summary_totals)
+    counts = Counter()
+    for (view, method, _), count in request_counts.items():
+        counts[(view, method)] += count
+    lines = []
+    for name in COUNTERS:
+        lines.append(f'# TYPE foodgram_{name}_total counter')
+        lines.append(f'foodgram_{name}_total {counters[name]}')
+    lines.append('# TYPE foodgram_requests_total counter')
+    for (view, method, status), count in sorted(request_counts.items()):
+        lines.append(
+            f'foodgram_requests_total{{{_labels(view, method)},'
+            f'status="{status}"}} {count}'
+        )
+    for name, field in SUMMARY_FIELDS:
+        lines.append(f'# TYPE foodgram_{name} summary')
+        for (view, method), count in sorted(counts.items()):
+            labels = _labels(view, method)
+            values = sorted(item[field] for item in groups[(view, method)])
+            if values:
+                points = (
+                    quantiles(values, n=100, method='inclusive')
+                    if len(values) > 1 else values * 99
+                )
+                for quantile in QUANTILES:
+                    lines.append(
+                        f'foodgram_{name}{{{labels},quantile="{quantile}"}} '
+                        f'{points[int(quantile * 100) - 1]}'
+                    )
+            lines.append(
+                f'foodgram_{name}_sum{{{labels}}} '
+                f'{totals[(view, method, field)]}'
+            )
+            lines.append(f'foodgram_{name}_count{{{labels}}} {count}')
+    return '\n'.join(lines) + '\n'
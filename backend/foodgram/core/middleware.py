@@ -0,0 +1,85 @@
+import asyncio
+import logging
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+from .metrics import QueryCollector, query_collector, record
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsMiddleware:
+    """Собирает время ответа, число и время SQL-запросов и время
+    рендеринга ответа для каждого представления.
+
+    Предупреждает о запросах, повторяющихся в рамках одного HTTP-запроса
+    (признак N+1). При METRICS_ENABLED = False не подключается.
+    Работает и в синхронной, и в асинхронной цепочке: в асинхронной
+    запросы и ожидание потока из пула соединений считает
+    core.db.database_sync_to_async.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        request._render_time = 0.0
+        collector = QueryCollector()
+        start = perf_counter()
+        with connection.execute_wrapper(collector):
+            response = self.get_response(request)
+        self.finish(request, response, collector, perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        request._render_time = 0.0
+        collector = QueryCollector()
+        token = query_collector.set(collector)
+        start = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            query_collector.reset(token)
+        self.finish(request, response, collector, perf_counter() - start)
+        return response
+
+    def finish(self, request, response, collector, total):
+        view = (
+            request.resolver_match.view_name
+            if request.resolver_match else 'unresolved'
+        )
+        record(
+            view=view,
+            method=request.method,
+            status=response.status_code,
+            total=total,
+            db_time=collector.db_time,
+            db_wait=collector.db_wait,
+            render_time=request._render_time,
+            queries=sum(collector.queries.values()),
+        )
+        for sql, count in collector.queries.items():
+            if count >= settings.METRICS_REPEATED_QUERY_THRESHOLD:
+                logger.warning(
+                    'Запрос повторился %s раз в %s %s: %s',
+                    count, request.method, view, sql
+                )
+
+    def process_template_response(self, request, response):
+        if response.is_rendered:
+            return response
+        start = perf_counter()
+        response.render()
+        request._render_time = perf_counter() - start
+        return response
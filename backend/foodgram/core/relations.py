@@ -0,0 +1,87 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import IntegerField, Value
+
+from .cache import initial_version
+from content.models import Favourite, ShoppingList
+from users.models import Follow
+
+RELATIONS_KEY = 'relations:{}:{}'
+RELATIONS_VERSION_KEY = 'relations-version:{}'
+FAVORITES, SHOPPING_CART, FOLLOWING = range(3)
+
+
+class UserRelations:
+    """Идентификаторы избранных рецептов, рецептов в списке покупок
+    и авторов, на которых подписан пользователь.
+    """
+
+    def __init__(self, favorites=(), shopping_cart=(), following=()):
+        self.favorites = frozenset(favorites)
+        self.shopping_cart = frozenset(shopping_cart)
+        self.following = frozenset(following)
+
+    @classmethod
+    def from_db(cls, user):
+        """Загружает все связи пользователя одним запросом."""
+        def kind(value):
+            return Value(value, output_field=IntegerField())
+
+        rows = Favourite.objects.filter(user=user).annotate(
+            kind=kind(FAVORITES)
+        ).values_list('recipe_id', 'kind').union(
+            ShoppingList.objects.filter(user=user).annotate(
+                kind=kind(SHOPPING_CART)
+            ).values_list('recipe_id', 'kind'),
+            Follow.objects.filter(user=user).annotate(
+                kind=kind(FOLLOWING)
+            ).values_list('following_id', 'kind'),
+            all=True
+        )
+        groups = ([], [], [])
+        for pk, group in rows:
+            groups[group].append(pk)
+        return cls(*groups)
+
+    @classmethod
+    def load(cls, user):
+        """Возвращает связи пользователя из кэша или из БД.
+
+        Ключ включает версию связей, прочитанную до запроса к БД: если
+        связи изменились во время чтения, устаревшие данные сохранятся
+        под прежней версией, и их уже никто не прочитает.
+        """
+        if not user.is_authenticated:
+            return cls()
+        version_key = RELATIONS_VERSION_KEY.format(user.id)
+        version = cache.get(version_key)
+        if version is None:
+            cache.add(version_key, initial_version(), None)
+            version = cache.get(version_key)
+        key = RELATIONS_KEY.format(user.id, version)
+        relations = cache.get(key)
+        if relations is None:
+            relations = cls.from_db(user)
+            cache.set(key, relations, settings.USER_RELATIONS_TIMEOUT)
+        return relations
+
+
+def get_relations(request):
+    """Возвращает связи пользователя, загружая их один раз за запрос."""
+    relations = getattr(request, '_user_relations', None)
+    if relations is None:
+        relations = UserRelations.load(request.user)
+        request._user_relations = relations
+    return relations
+
+
+def invalidate_relations(user_id):
+    """Меняет версию связей пользователя, сбрасывая их кэш
+    во всех процессах.
+    """
+    version_key = RELATIONS_VERSION_KEY.format(user_id)
+    cache.add(version_key, initial_version(), None)
+    try:
+        cache.incr(version_key)
+    except ValueError:
+        cache.set(version_key, initial_version(), None)
@@ -1,7 +1,22 @@
 from rest_framework import serializers
 
+from .relations import get_relations
+from content.images import get_rendition_urls
 from content.models import Recipe
-from users.models import Follow, User
+from users.models import User
+
+
+def get_image_urls(request, name, ready):
+    """Возвращает абсолютные адреса копий изображения рецепта."""
+    return {
+        size: {
+            image_format: (
+                request.build_absolute_uri(url) if request else url
+            )
+            for image_format, url in urls.items()
+        }
+        for size, urls in get_rendition_urls(name, ready).items()
+    }
 
 
 class BasicUserSerializer(serializers.ModelSerializer):
@@ -16,16 +31,22 @@ class BasicUserSerializer(serializers.ModelSerializer):
         )
 
     def get_is_subscribed(self, obj):
-        request_user = (self.context.get('request', None).user
-                        if 'request' in self.context else None)
-        if request_user and request_user.is_authenticated:
-            return Follow.objects.filter(
-                user__id=request_user.id, following__id=obj.id).exists()
-        return False
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        if 'request' not in self.context:
+            return False
+        return obj.id in get_relations(self.context['request']).following
 
 
 class BasicRecipeSerializer(serializers.ModelSerializer):
     """Базовый сериалайзер для работы с рецептами."""
+    images = serializers.SerializerMethodField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'image', 'name', 'cooking_time')
+        fields = ('id', 'image', 'images', 'name', 'cooking_time')
+
+    def get_images(self, obj):
+        return get_image_urls(
+            self.context.get('request'), obj.image.name, obj.renditions_ready
+        )
@@ -0,0 +1,31 @@
+from django.core.signals import request_started
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .db import check_connections
+from .metrics import increment
+from .relations import invalidate_relations
+from content.models import Favourite, ShoppingList
+from users.models import Follow
+
+
+@receiver((post_save, post_delete), sender=Favourite)
+@receiver((post_save, post_delete), sender=ShoppingList)
+@receiver((post_save, post_delete), sender=Follow)
+def invalidate_user_relations(sender, instance, **kwargs):
+    """Сбрасывает кэш связей пользователя после коммита изменений."""
+    transaction.on_commit(lambda: invalidate_relations(instance.user_id))
+
+
+@receiver(request_started)
+def check_reused_connections(sender, **kwargs):
+    """Проверяет постоянные соединения в начале запроса."""
+    check_connections()
+
+
+@receiver(connection_created)
+def count_connection(sender, connection, **kwargs):
+    """Считает новые соединения с БД для метрик."""
+    increment('db_connections_opened')
@@ -0,0 +1,107 @@
+from collections import Counter, deque
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.signals import request_finished, request_started
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+
+from . import metrics
+from .metrics import counters
+from .relations import UserRelations, invalidate_relations
+from content.models import Tag
+from users.models import Follow, User
+
+
+class ConnectionReuseTest(TransactionTestCase):
+    """Постоянное соединение переживает конец запроса и используется
+    следующими запросами.
+    """
+
+    def request(self):
+        request_started.send(sender=self.__class__)
+        try:
+            Tag.objects.exists()
+        finally:
+            request_finished.send(sender=self.__class__)
+
+    @mock.patch.dict(connection.settings_dict, CONN_MAX_AGE=60)
+    def test_reused_across_requests(self):
+        # Соединение, открытое до смены CONN_MAX_AGE, закрылось бы
+        # в конце первого запроса.
+        connection.close()
+        opened = counters['db_connections_opened']
+        reused = counters['db_connections_reused']
+        for _ in range(3):
+            self.request()
+        self.assertLessEqual(counters['db_connections_opened'] - opened, 1)
+        self.assertGreaterEqual(counters['db_connections_reused'] - reused, 2)
+
+
+class UserRelationsTest(TestCase):
+    """Кэш связей не хранит данные, прочитанные до их изменения."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.author = (
+            User.objects.create_user(
+                username=name, email=f'{name}@example.com',
+                first_name=name, last_name=name, password='pass'
+            )
+            for name in ('reader', 'author')
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_change_during_load(self):
+        from_db = UserRelations.from_db
+
+        def follow_while_loading(user):
+            try:
+                return from_db(user)
+            finally:
+                Follow.objects.create(user=self.user, following=self.author)
+                invalidate_relations(self.user.id)
+
+        with mock.patch.object(
+            UserRelations, 'from_db', side_effect=follow_while_loading
+        ):
+            self.assertFalse(UserRelations.load(self.user).following)
+        self.assertEqual(
+            UserRelations.load(self.user).following, {self.author.id}
+        )
+
+    def test_cached_until_changed(self):
+        UserRelations.load(self.user)
+        with self.assertNumQueries(0):
+            UserRelations.load(self.user)
+
+
+class PrometheusTest(SimpleTestCase):
+    """Счетчики запросов не уменьшаются, когда буфер вытесняет записи."""
+
+    def request(self, status=200):
+        metrics.record(
+            view='recipes-list', method='GET', status=status, total=0.5,
+            db_time=0.1, db_wait=0.0, render_time=0.1, queries=3
+        )
+
+    def test_counters_survive_eviction(self):
+        with mock.patch.multiple(
+            metrics, records=deque(maxlen=2), request_totals=Counter(),
+            summary_totals=Counter()
+        ):
+            for _ in range(4):
+                self.request()
+            self.request(status=404)
+            lines = metrics.render_prometheus().splitlines()
+        labels = 'view="recipes-list",method="GET"'
+        self.assertIn(
+            f'foodgram_requests_total{{{labels},status="200"}} 4', lines
+        )
+        self.assertIn(
+            f'foodgram_requests_total{{{labels},status="404"}} 1', lines
+        )
+        self.assertIn(f'foodgram_db_queries_count{{{labels}}} 5', lines)
+        self.assertIn(f'foodgram_db_queries_sum{{{labels}}} 15', lines)
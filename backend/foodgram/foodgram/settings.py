@@ -32,14 +32,26 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.MetricsMiddleware',
 ]
 
+ASYNC_VIEWS = env.bool('ASYNC_VIEWS', default=False)
+
+COMPRESS_MIN_LENGTH = env.int('COMPRESS_MIN_LENGTH', default=1024)
+COMPRESS_GZIP_LEVEL = 6
+COMPRESS_BR_QUALITY = 5
+
+METRICS_ENABLED = env.bool('METRICS_ENABLED', default=False)
+METRICS_BUFFER_SIZE = env.int('METRICS_BUFFER_SIZE', default=10000)
+METRICS_REPEATED_QUERY_THRESHOLD = 5
+
 ROOT_URLCONF = 'foodgram.urls'
 
 TEMPLATES = [
@@ -68,8 +80,27 @@ DATABASES = {
         'PASSWORD': env('POSTGRES_PASSWORD', default='postgres'),
         'HOST': env('DB_HOST', default='host'),
         'PORT': env('DB_PORT', default='port'),
+        'CONN_MAX_AGE': env.int('DB_CONN_MAX_AGE', default=60),
     }
 }
+DB_CONN_HEALTH_CHECKS = env.bool('DB_CONN_HEALTH_CHECKS', default=True)
+DB_POOL_SIZE = env.int('DB_POOL_SIZE', default=0)
+
+# Версии данных для ETag и сброса индексов общие для всех процессов,
+# поэтому вне разработки и тестов нужен общий кэш, например
+# pymemcache://memcached:11211 (проверяется manage.py check --deploy).
+CACHE_URL = env('CACHE_URL', default='locmemcache://')
+CACHES = {
+    # django-environ 0.10 сопоставляет pymemcache:// с PyLibMCCache.
+    'default': env.cache_url_config(
+        CACHE_URL,
+        backend='django.core.cache.backends.memcached.PyMemcacheCache'
+        if CACHE_URL.startswith('pymemcache://') else None
+    ),
+}
+
+REFERENCE_CACHE_TIMEOUT = env.int('REFERENCE_CACHE_TIMEOUT', default=3600)
+USER_RELATIONS_TIMEOUT = env.int('USER_RELATIONS_TIMEOUT', default=600)
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -104,6 +135,26 @@ STATIC_ROOT = BASE_DIR / 'assets'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+IMAGE_WORKERS = env.int('IMAGE_WORKERS', default=2)
+RECIPE_IMAGE_MAX_SIZE = 5 * 1024 * 1024
+RECIPE_IMAGE_MAX_PIXELS = 25_000_000
+RECIPE_IMAGE_QUALITY = 85
+RECIPE_IMAGE_SIZES = {
+    'thumbnail': 400,
+    'medium': 1000,
+}
+
+PDF_FONT_PATH = env(
+    'PDF_FONT_PATH',
+    default='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+# Файл для load_ingredients, если путь не передан аргументом.
+INGREDIENTS_PATH = env(
+    'INGREDIENTS_PATH',
+    default=str(BASE_DIR.parent.parent / 'data' / 'ingredients.csv')
+)
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
@@ -112,6 +163,10 @@ REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 6,
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 DJOSER = {
@@ -123,6 +178,17 @@ DJOSER = {
     }
 }
 
+INGREDIENT_SEARCH_LIMIT = 50
+RECIPE_BULK_LIMIT = 100
+RELATION_BATCH_LIMIT = 100
+MAX_SERVINGS = 100
+FEED_FANOUT_LIMIT = 10000
+FEED_BACKFILL_LIMIT = 100
+FEED_BATCH_SIZE = 1000
+ADMIN_ESTIMATED_COUNT_THRESHOLD = 10000
+RECIPE_MATCH_LIMIT = 20
+RECIPE_MATCH_INDEX_TTL = 300
+
 USER_FIELD_LENGTH = 150
 USER_LONG_FIELD_LENGTH = 254
 HEX_LENGTH = 7
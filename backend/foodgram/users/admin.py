@@ -1,11 +1,16 @@
 from django.contrib import admin
 
 from .models import User
+from core.paginators import EstimatedCountPaginator
 
 
 class UserAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'username', 'email', 'first_name', 'last_name',)
+    list_display = ('pk', 'username', 'email', 'first_name', 'last_name',
+                    'recipes_count', 'followers_count',)
     search_fields = ('username', 'email')
+    ordering = ('id',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = '-empty-'
 
 
@@ -25,6 +25,14 @@ class User(AbstractUser):
     last_name = models.CharField(
         max_length=settings.USER_FIELD_LENGTH
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False
+    )
 
 
 class Follow(models.Model):
@@ -32,12 +40,14 @@ class Follow(models.Model):
     user = models.ForeignKey(
         User,
         related_name='follower',
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False
     )
     following = models.ForeignKey(
         User,
         related_name='following',
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False
     )
 
     class Meta:
@@ -51,3 +61,9 @@ class Follow(models.Model):
                 name='no_self_follow'
             ),
         )
+        indexes = (
+            models.Index(
+                fields=('following', 'user'),
+                name='follow_following_user_idx'
+            ),
+        )